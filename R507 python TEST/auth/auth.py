@@ -1,17 +1,102 @@
 import jwt
 import datetime
-from flask import Flask, jsonify, request, Response
+import os
+import time
+from flask import Flask, jsonify, request, Response, g
 from pathlib import Path
+from cryptography.hazmat.primitives import serialization
+from jwt.algorithms import get_default_algorithms
+from prometheus_client import CONTENT_TYPE_LATEST, Gauge, Histogram, generate_latest
 
 app = Flask(__name__)
 
-# Charger la clé privée
-with open("private_key.pem", "r") as f:
-    private_key = f.read()
+DOSSIER = Path(__file__).resolve().parent
+
+# Jeu de clés : kid -> (algorithme, fichier clé privée, fichier clé publique).
+# Une clé sans fichier privé ne sert plus qu'à vérifier (rotation en cours).
+# Format de JWT_CLES : "kid=ALG:prive.pem:public.pem;kid2=ALG:prive2.pem:public2.pem"
+CLES_PAR_DEFAUT = "rs256-1=RS256:private_key.pem:public_key.pem;" \
+                  "es256-1=ES256:es256_private_key.pem:es256_public_key.pem;" \
+                  "eddsa-1=EdDSA:ed25519_private_key.pem:ed25519_public_key.pem"
+# Clé utilisée pour signer les nouveaux jetons
+KID_ACTIF = os.environ.get('JWT_KID_ACTIF', 'rs256-1')
+
+
+class Cle:
+    """Clé de signature chargée et analysée une seule fois au démarrage."""
+
+    def __init__(self, kid, algorithme, privee, publique):
+        self.kid = kid
+        self.algorithme = algorithme
+        self.privee = privee
+        self.publique = publique
+
+    def jwk(self):
+        # Public part only, as published in the JWKS document
+        jwk = get_default_algorithms()[self.algorithme].to_jwk(self.publique, as_dict=True)
+        jwk.update({"kid": self.kid, "alg": self.algorithme, "use": "sig"})
+        return jwk
+
+
+def charger_cles(configuration):
+    cles = {}
+    for entree in filter(None, (e.strip() for e in configuration.split(';'))):
+        kid, _, reste = entree.partition('=')
+        algorithme, fichier_prive, fichier_public = reste.split(':')
+        chemin_public = DOSSIER / fichier_public
+        if not chemin_public.exists():
+            continue
+        publique = serialization.load_pem_public_key(chemin_public.read_bytes())
+        chemin_prive = DOSSIER / fichier_prive if fichier_prive else None
+        privee = None
+        if chemin_prive and chemin_prive.exists():
+            privee = serialization.load_pem_private_key(chemin_prive.read_bytes(), password=None)
+        cles[kid] = Cle(kid, algorithme, privee, publique)
+    return cles
+
+
+cles = charger_cles(os.environ.get('JWT_CLES', CLES_PAR_DEFAUT))
+if KID_ACTIF not in cles or cles[KID_ACTIF].privee is None:
+    raise RuntimeError(f"Clé de signature introuvable pour le kid {KID_ACTIF}.")
+cle_active = cles[KID_ACTIF]
+
+# Métriques Prometheus, exposées en texte sur /metrics
+requetes_http = Histogram('auth_http_request_duration_seconds', 'Durée des requêtes HTTP par route.',
+                          ('method', 'route', 'status'))
+requetes_en_cours = Gauge('auth_http_requests_in_progress', 'Requêtes HTTP en cours de traitement.', ('method',))
+
+
+@app.before_request
+def debut_requete():
+    g.debut_requete = time.perf_counter()
+    requetes_en_cours.labels(request.method).inc()
+
+
+@app.after_request
+def statut_requete(response):
+    g.statut_requete = response.status_code
+    return response
+
+
+@app.teardown_request
+def fin_requete(exception):
+    # Also runs after an unhandled exception, unlike after_request
+    if 'debut_requete' not in g:
+        return
+    requetes_en_cours.labels(request.method).dec()
+    route = request.url_rule.rule if request.url_rule is not None else '<inconnue>'
+    requetes_http.labels(request.method, route, str(g.get('statut_requete', 500))).observe(
+        time.perf_counter() - g.debut_requete)
+
+
+def verifier_token(token):
+    """Vérifie la signature et l'expiration avec la clé désignée par le kid du jeton."""
+    kid = jwt.get_unverified_header(token).get('kid', KID_ACTIF)
+    cle = cles.get(kid)
+    if cle is None:
+        raise jwt.InvalidTokenError("Clé inconnue")
+    return jwt.decode(token, cle.publique, algorithms=[cle.algorithme])
 
-# Charger la clé publique pour vérifier les JWT
-with open("public_key.pem", "r") as f:
-    public_key = f.read()
 
 @app.route('/login', methods=['POST'])
 def login():
@@ -21,27 +106,40 @@ def login():
 
     # Ici tu devrais vérifier les informations d'identification
     if username == 'admin' and password == 'password':
-        # Créer un JWT signé avec RS256
+        # Créer un JWT signé avec la clé active
         payload = {
             "user_id": 1,
             "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1)  # Expiration dans 1 heure
         }
 
-        token = jwt.encode(payload, private_key, algorithm='RS256')
+        token = jwt.encode(payload, cle_active.privee, algorithm=cle_active.algorithme,
+                           headers={"kid": cle_active.kid})
+        app.logger.info(f"Jeton émis pour {username} (kid {cle_active.kid})")
         return jsonify({"token": token})
 
+    app.logger.warning(f"Échec de connexion pour {username}")
     return Response("Unauthorized", status=401)
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+
+@app.route('/.well-known/jwks.json', methods=['GET'])
+def jwks():
+    # Clés publiques, pour vérifier les jetons localement dans les autres services
+    return jsonify({"keys": [cle.jwk() for cle in cles.values()]})
+
 @app.route('/protected', methods=['GET'])
 def protected():
     # Vérifier le JWT dans les headers Authorization
     token = request.headers.get('Authorization')
     if not token:
         return Response("Missing token", status=400)
+    token = token.removeprefix('Bearer ').strip()
 
     try:
         # Vérifier et décoder le token avec la clé publique
-        decoded = jwt.decode(token, public_key, algorithms=['RS256'])
+        decoded = verifier_token(token)
         return jsonify({"message": "Access granted", "user_id": decoded['user_id']})
     except jwt.ExpiredSignatureError:
         return Response("Token expired", status=401)
@@ -0,0 +1,39 @@
+"""
+Génère les paires de clés ES256 (P-256) et EdDSA (Ed25519) utilisées par
+auth.py en plus de la clé RS256 existante.
+
+Usage : python generer_cles.py [--force]
+"""
+import argparse
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+DOSSIER = Path(__file__).resolve().parent
+
+CLES = {
+    "es256": lambda: ec.generate_private_key(ec.SECP256R1()),
+    "ed25519": ed25519.Ed25519PrivateKey.generate,
+}
+
+
+def ecrire(prefixe, privee, force):
+    chemin_prive = DOSSIER / f"{prefixe}_private_key.pem"
+    chemin_public = DOSSIER / f"{prefixe}_public_key.pem"
+    if chemin_prive.exists() and not force:
+        print(f"{chemin_prive.name} existe déjà (utiliser --force pour le remplacer)")
+        return
+    chemin_prive.write_bytes(privee.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    chemin_public.write_bytes(privee.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo))
+    print(f"{chemin_prive.name} et {chemin_public.name} générés")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+    for prefixe, generer in CLES.items():
+        ecrire(prefixe, generer(), args.force)
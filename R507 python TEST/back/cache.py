@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Configuration of the in-process caches (overridable through the environment)
+TAILLE_MAX = int(os.environ.get("CACHE_TAILLE", "10000"))
+TTL = float(os.environ.get("CACHE_TTL", "60"))
+
+# Returned by get() on a miss, so that None can be cached like any other value
+ABSENT = object()
+
+
+class LRUCache:
+    """
+    Cache borné en mémoire (LRU) avec durée de vie des entrées.
+
+    Propre à chaque processus : les écritures faites par un autre worker ne
+    l'invalident pas, d'où le TTL qui borne la durée d'une donnée périmée
+    (serve.py désactive les caches quand il lance plusieurs workers).
+    Une taille maximale de 0 désactive le cache.
+    """
+
+    def __init__(self, nom, taille_max=TAILLE_MAX, ttl=TTL):
+        self.nom = nom
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self._entrees = OrderedDict()
+        self._lock = threading.Lock()
+        self._invalidations = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, cle):
+        with self._lock:
+            entree = self._entrees.get(cle)
+            if entree is not None:
+                expiration, valeur = entree
+                if expiration > time.monotonic():
+                    self._entrees.move_to_end(cle)
+                    self.hits += 1
+                    return valeur
+                del self._entrees[cle]
+            self.misses += 1
+            return ABSENT
+
+    def jeton(self):
+        """
+        À prendre avant de lire la base : passé à set(), il empêche de mettre en
+        cache une valeur lue avant une invalidation survenue entre-temps.
+        """
+        return self._invalidations
+
+    def set(self, cle, valeur, jeton=None, ttl=None):
+        """`ttl` peut raccourcir la durée de vie de cette entrée, jamais l'allonger."""
+        if self.taille_max <= 0:
+            return
+        with self._lock:
+            if jeton is not None and jeton != self._invalidations:
+                return
+            duree = self.ttl if ttl is None else min(ttl, self.ttl)
+            self._entrees[cle] = (time.monotonic() + duree, valeur)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *cles):
+        with self._lock:
+            self._invalidations += 1
+            for cle in cles:
+                self._entrees.pop(cle, None)
+
+    def clear(self):
+        with self._lock:
+            self._invalidations += 1
+            self._entrees.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "nom": self.nom,
+                "taille": len(self._entrees),
+                "taille_max": self.taille_max,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
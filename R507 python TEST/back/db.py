@@ -0,0 +1,431 @@
+import asyncio
+import functools
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from metriques import observer_sql
+from schema import MIGRATIONS, migrate
+
+# Configuration of the data-access layer (overridable through the environment)
+DATABASE_PATH = os.environ.get(
+    "DATABASE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "database", "database.db"),
+)
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+CACHED_STATEMENTS = int(os.environ.get("SQLITE_CACHED_STATEMENTS", "256"))
+BUSY_TIMEOUT = float(os.environ.get("SQLITE_BUSY_TIMEOUT", "5"))
+MAX_WORKERS = int(os.environ.get("DB_MAX_WORKERS", str(POOL_SIZE)))
+MAX_PENDING = int(os.environ.get("DB_MAX_PENDING", "256"))
+EXPORT_BATCH_SIZE = int(os.environ.get("DB_EXPORT_BATCH_SIZE", "1000"))
+
+PRAGMAS = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    "cache_size": os.environ.get("SQLITE_CACHE_SIZE", "-16000"),
+    "foreign_keys": os.environ.get("SQLITE_FOREIGN_KEYS", "OFF"),
+}
+
+_ALLOWED_PRAGMA_VALUES = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA", "0", "1", "2", "3"},
+    "foreign_keys": {"ON", "OFF", "0", "1"},
+}
+
+
+def _pragma_statements(pragmas):
+    """
+    Construit les instructions PRAGMA à partir de la configuration.
+    Les valeurs sont validées car elles ne peuvent pas être passées en paramètre.
+    """
+    statements = []
+    for name, value in pragmas.items():
+        if value is None or value == "":
+            continue
+        value = str(value).upper()
+        allowed = _ALLOWED_PRAGMA_VALUES.get(name)
+        if allowed is not None:
+            if value not in allowed:
+                raise ValueError(f"Valeur invalide pour PRAGMA {name}: {value}")
+        elif not value.lstrip("-").isdigit():
+            raise ValueError(f"Valeur invalide pour PRAGMA {name}: {value}")
+        statements.append(f"PRAGMA {name} = {value}")
+    return statements
+
+
+class ConnectionPool:
+    """
+    Pool borné de connexions SQLite réutilisées entre les requêtes.
+
+    Les connexions sont créées à la demande (au plus `size`), configurées une
+    seule fois (PRAGMA, cache d'instructions préparées) puis rendues au pool
+    après usage. Une connexion n'est utilisée que par un seul thread à la fois.
+    """
+
+    def __init__(self, path=DATABASE_PATH, size=POOL_SIZE, pragmas=None,
+                 timeout=POOL_TIMEOUT, cached_statements=CACHED_STATEMENTS):
+        if size < 1:
+            raise ValueError("La taille du pool doit être positive.")
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._pragmas = _pragma_statements(PRAGMAS if pragmas is None else pragmas)
+        # LIFO so that the most recently used (warm) connection is reused first
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        for statement in self._pragmas:
+            conn.execute(statement)
+        return conn
+
+    def open_dedicated(self):
+        """
+        Ouvre une connexion configurée comme celles du pool mais hors quota,
+        pour les lectures longues (exports) qui ne doivent pas monopoliser le pool.
+        """
+        return self._connect()
+
+    def acquire(self):
+        if self._closed:
+            raise RuntimeError("Le pool de connexions est fermé.")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError("Aucune connexion SQLite disponible dans le pool.")
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            # Never hand a broken connection back to the pool
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                conn.close()
+                with self._lock:
+                    self._created -= 1
+                raise
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class DatabaseBusy(Exception):
+    """Levée quand la file d'attente des requêtes SQL est pleine."""
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_executor = None
+_pending = 0
+_pending_lock = threading.Lock()
+_commits = 0
+_commits_lock = threading.Lock()
+
+
+def migrer(path=None):
+    """
+    Applique les migrations manquantes du schéma, sur une connexion dédiée.
+    À appeler une seule fois au démarrage (serve.py, python.py, scripts),
+    avant que les workers n'ouvrent leur pool.
+    """
+    conn = ConnectionPool(path or DATABASE_PATH, size=1).open_dedicated()
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
+
+
+def verifier_schema():
+    """
+    Vérifie que toutes les migrations ont été appliquées.
+    Lève RuntimeError sinon, pour qu'un serveur ne démarre pas sur un ancien schéma.
+    """
+    with get_pool().connection() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < len(MIGRATIONS):
+        raise RuntimeError(
+            f"Schéma de la base en version {version} au lieu de {len(MIGRATIONS)} : "
+            "appliquer les migrations (db.migrer(), fait par serve.py et python.py) avant de démarrer."
+        )
+
+
+def get_pool():
+    """
+    Retourne le pool du processus courant.
+    Chaque worker uvicorn (processus forké) crée son propre pool.
+    Le schéma doit déjà être à jour (voir migrer).
+    """
+    global _pool, _pool_pid, _executor
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                # Threads and connections inherited from a parent process are unusable
+                _executor = None
+                _pool = ConnectionPool()
+                _pool_pid = pid
+    return _pool
+
+
+def get_executor():
+    """
+    Retourne l'exécuteur dédié aux accès SQLite du processus courant.
+    Il a autant de threads que le pool a de connexions.
+    """
+    global _executor
+    get_pool()
+    if _executor is None:
+        with _pool_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="sqlite")
+    return _executor
+
+
+def close_pool():
+    global _pool, _pool_pid, _executor
+    with _pool_lock:
+        if _pool_pid == os.getpid():
+            if _executor is not None:
+                _executor.shutdown(wait=True)
+            if _pool is not None:
+                _pool.close()
+        _executor = None
+        _pool = None
+        _pool_pid = None
+
+
+def _job_done(future):
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+async def run_in_db(func, *args, **kwargs):
+    """
+    Exécute `func` dans l'exécuteur SQLite sans bloquer la boucle d'événements.
+    Lève DatabaseBusy si trop de requêtes sont déjà en attente (back-pressure).
+    """
+    global _pending
+    executor = get_executor()
+    with _pending_lock:
+        if _pending >= MAX_PENDING:
+            raise DatabaseBusy("Trop de requêtes en attente sur la base de données.")
+        _pending += 1
+    try:
+        future = executor.submit(functools.partial(func, *args, **kwargs))
+    except BaseException:
+        with _pending_lock:
+            _pending -= 1
+        raise
+    # The slot is freed when the job really ends, even if the caller is cancelled
+    future.add_done_callback(_job_done)
+    return await asyncio.wrap_future(future)
+
+
+def _count_commit():
+    global _commits
+    with _commits_lock:
+        _commits += 1
+
+
+def commit_count():
+    """Nombre de COMMIT effectués par ce processus (utile aux benchmarks)."""
+    return _commits
+
+
+class TimedCursor:
+    """
+    Curseur de lecture dont la mesure (durée depuis l'exécution, lignes lues)
+    est enregistrée une fois le résultat consommé : fetchall, fin de
+    l'itération ou de fetchmany, ou premier fetchone (lecture d'une ligne).
+    """
+
+    def __init__(self, cur, query, debut):
+        self._cur = cur
+        self._query = query
+        self._debut = debut
+        self._lignes = 0
+        self._mesure = False
+
+    def _terminer(self):
+        if not self._mesure:
+            self._mesure = True
+            observer_sql(self._query, time.perf_counter() - self._debut, self._lignes)
+
+    def fetchone(self):
+        row = self._cur.fetchone()
+        if row is not None:
+            self._lignes += 1
+        self._terminer()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self._cur.arraysize if size is None else size
+        rows = self._cur.fetchmany(size)
+        self._lignes += len(rows)
+        if len(rows) < size:
+            self._terminer()
+        return rows
+
+    def fetchall(self):
+        rows = self._cur.fetchall()
+        self._lignes += len(rows)
+        self._terminer()
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            row = next(self._cur)
+        except StopIteration:
+            self._terminer()
+            raise
+        self._lignes += 1
+        return row
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+
+def timed_execute(conn, query, params=(), fetch=None, many=False):
+    """
+    Exécute une instruction en la chronométrant (métriques SQL, journal des
+    requêtes lentes). `fetch` vaut "one", "all" ou None (curseur retourné).
+    Sans fetch, une lecture retourne un TimedCursor, mesuré quand ses lignes
+    ont été lues ; une écriture compte les lignes modifiées (rowcount).
+    """
+    debut = time.perf_counter()
+    cur = conn.executemany(query, params) if many else conn.execute(query, params)
+    if fetch == "one":
+        result = cur.fetchone()
+        lignes = 0 if result is None else 1
+    elif fetch == "all":
+        result = cur.fetchall()
+        lignes = len(result)
+    elif cur.description is not None:
+        return TimedCursor(cur, query, debut)
+    else:
+        result = cur
+        lignes = max(cur.rowcount, 0)
+    observer_sql(query, time.perf_counter() - debut, lignes)
+    return result
+
+
+class TimedConnection:
+    """
+    Connexion SQLite dont `execute` et `executemany` passent par timed_execute.
+    Les autres attributs sont ceux de la connexion enveloppée.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, query, params=()):
+        return timed_execute(self._conn, query, params)
+
+    def executemany(self, query, params):
+        return timed_execute(self._conn, query, params, many=True)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+@contextmanager
+def transaction():
+    """
+    Ouvre une transaction d'écriture (BEGIN IMMEDIATE) sur une connexion du pool.
+    Un seul COMMIT est fait en sortie ; toute exception annule la transaction.
+    Les instructions exécutées dans la transaction sont mesurées.
+    """
+    with get_pool().connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield TimedConnection(conn)
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        _count_commit()
+
+
+# Utility function to interact with the SQLite database
+def execute_query(query, params=(), fetchone=False, commit=False):
+    with get_pool().connection() as conn:
+        if commit:
+            cur = timed_execute(conn, query, params)
+            conn.commit()
+            _count_commit()
+            return cur.lastrowid
+        return timed_execute(conn, query, params, fetch="one" if fetchone else "all")
+
+
+async def run_query(query, params=(), fetchone=False, commit=False):
+    return await run_in_db(execute_query, query, params, fetchone=fetchone, commit=commit)
+
+
+def stream_rows(query, params=(), batch_size=EXPORT_BATCH_SIZE):
+    """
+    Générateur de lots de lignes (fetchmany) sur une connexion dédiée :
+    la mémoire utilisée ne dépend que de `batch_size`, pas de la taille de la table.
+    """
+    conn = get_pool().open_dedicated()
+    try:
+        cur = conn.execute(query, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
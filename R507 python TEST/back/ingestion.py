@@ -0,0 +1,184 @@
+"""
+Import en masse de catalogues au format de data_books.json (tableau JSON)
+ou NDJSON (un objet par ligne).
+
+Le fichier est lu au fil de l'eau, les auteurs sont résolus via une table
+nom -> id gardée en mémoire et les livres sont insérés avec executemany,
+une transaction par lot.
+
+Usage : python ingestion.py data_books.json [--taille-lot 10000]
+"""
+import argparse
+import json
+import re
+import time
+
+from db import get_pool, migrer, transaction
+from schema import annee_depuis_date, compter_livres, indexer_livres
+
+TAILLE_LOT = 10000
+TAILLE_BLOC = 1 << 16
+# Names per "IN (...)" lookup, well below SQLite's bound-parameter limit
+TAILLE_IN = 500
+
+# Accepted field names: data_books.json first, then the column names
+CHAMPS = {
+    "titre": ("title", "titre"),
+    "pitch": ("content", "pitch"),
+    "date_public": ("date", "date_public"),
+    "auteur_nom": ("author", "auteur_nom", "auteur"),
+}
+
+_SEPARATEURS = re.compile(r"[\s,]*")
+
+
+def _objets_tableau(tampon, flux, taille_bloc):
+    # Incremental decoding of "[{...}, {...}]" without loading the whole file
+    decodeur = json.JSONDecoder()
+    pos = 0
+    while True:
+        pos = _SEPARATEURS.match(tampon, pos).end()
+        if pos < len(tampon) and tampon[pos] == "]":
+            return
+        try:
+            objet, fin = decodeur.raw_decode(tampon, pos)
+        except json.JSONDecodeError:
+            bloc = flux.read(taille_bloc)
+            if not bloc:
+                raise ValueError("Fichier JSON incomplet ou invalide.")
+            tampon = tampon[pos:] + bloc
+            pos = 0
+            continue
+        yield objet
+        pos = fin
+
+
+def _objets_ndjson(tampon, flux, taille_bloc):
+    while True:
+        bloc = flux.read(taille_bloc)
+        tampon += bloc
+        lignes = tampon.split("\n")
+        tampon = lignes.pop() if bloc else ""
+        for ligne in lignes:
+            if ligne.strip():
+                yield json.loads(ligne)
+        if not bloc:
+            return
+
+
+def lire_enregistrements(flux, taille_bloc=TAILLE_BLOC):
+    """
+    Itère sur les objets d'un flux texte, tableau JSON ou NDJSON
+    (détecté d'après le premier caractère significatif).
+    """
+    tampon = ""
+    while not tampon:
+        bloc = flux.read(taille_bloc)
+        if not bloc:
+            return
+        tampon = bloc.lstrip()
+    if tampon[0] == "[":
+        yield from _objets_tableau(tampon[1:], flux, taille_bloc)
+    else:
+        yield from _objets_ndjson(tampon, flux, taille_bloc)
+
+
+def _champ(enregistrement, cles):
+    for cle in cles:
+        valeur = enregistrement.get(cle)
+        if valeur:
+            return valeur
+    return None
+
+
+def normaliser(enregistrement):
+    """
+    Retourne (titre, pitch, date_public, annee_public, auteur_nom),
+    ou None si l'enregistrement est incomplet ou sa date invalide.
+    """
+    if not isinstance(enregistrement, dict):
+        return None
+    titre = _champ(enregistrement, CHAMPS["titre"])
+    date_public = _champ(enregistrement, CHAMPS["date_public"])
+    auteur_nom = _champ(enregistrement, CHAMPS["auteur_nom"])
+    if not titre or not date_public or not auteur_nom:
+        return None
+    try:
+        annee = annee_depuis_date(str(date_public))
+    except ValueError:
+        return None
+    return (str(titre), _champ(enregistrement, CHAMPS["pitch"]), str(date_public), annee, str(auteur_nom))
+
+
+def _inserer_lot(lot, auteurs):
+    with transaction() as conn:
+        nouveaux = {nom for *_, nom in lot if nom not in auteurs}
+        if nouveaux:
+            conn.executemany("INSERT OR IGNORE INTO Auteurs (nom_auteur) VALUES (?)", ((nom,) for nom in nouveaux))
+            # By name rather than by new id: an author created since the map was
+            # loaded (another import, POST /livres/ajouter) is ignored by the insert
+            nouveaux = list(nouveaux)
+            for debut in range(0, len(nouveaux), TAILLE_IN):
+                noms = nouveaux[debut:debut + TAILLE_IN]
+                auteurs.update(conn.execute(
+                    f"SELECT nom_auteur, id FROM Auteurs WHERE nom_auteur IN ({', '.join('?' * len(noms))})", noms
+                ))
+        dernier_livre = conn.execute("SELECT COALESCE(MAX(id), 0) FROM Livres").fetchone()[0]
+        # Full-text indexing and statistics of the whole batch at once rather than by the per-row triggers
+        conn.execute("INSERT INTO indexation_differee (actif) VALUES (1)")
+        # rowcount, unlike total_changes, does not include rows written by triggers
+        inseres = conn.executemany(
+            "INSERT OR IGNORE INTO Livres (titre, pitch, date_public, annee_public, auteur_id) VALUES (?, ?, ?, ?, ?)",
+            ((titre, pitch, date_public, annee, auteurs[nom]) for titre, pitch, date_public, annee, nom in lot)
+        ).rowcount
+        conn.execute("DELETE FROM indexation_differee")
+        indexer_livres(conn, dernier_livre)
+        compter_livres(conn, dernier_livre)
+        return inseres
+
+
+def importer(enregistrements, taille_lot=TAILLE_LOT):
+    """
+    Importe des enregistrements (itérable de dicts) par lots transactionnels.
+    Les titres déjà présents sont ignorés (titre unique), les enregistrements
+    invalides sont rejetés. Retourne un rapport chiffré de l'import.
+    """
+    debut = time.perf_counter()
+    with get_pool().connection() as conn:
+        auteurs = dict(conn.execute("SELECT nom_auteur, id FROM Auteurs"))
+    rapport = {"lus": 0, "inseres": 0, "ignores": 0, "rejetes": 0}
+    lot = []
+    for enregistrement in enregistrements:
+        rapport["lus"] += 1
+        ligne = normaliser(enregistrement)
+        if ligne is None:
+            rapport["rejetes"] += 1
+            continue
+        lot.append(ligne)
+        if len(lot) >= taille_lot:
+            rapport["inseres"] += _inserer_lot(lot, auteurs)
+            lot = []
+    if lot:
+        rapport["inseres"] += _inserer_lot(lot, auteurs)
+    rapport["ignores"] = rapport["lus"] - rapport["rejetes"] - rapport["inseres"]
+    rapport["duree"] = round(time.perf_counter() - debut, 3)
+    rapport["lignes_par_seconde"] = round(rapport["lus"] / rapport["duree"]) if rapport["duree"] else None
+    return rapport
+
+
+def importer_fichier(chemin, taille_lot=TAILLE_LOT):
+    with open(chemin, encoding="utf-8") as flux:
+        return importer(lire_enregistrements(flux), taille_lot)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import en masse d'un catalogue JSON ou NDJSON.")
+    parser.add_argument("fichier")
+    parser.add_argument("--taille-lot", type=int, default=TAILLE_LOT)
+    args = parser.parse_args()
+    migrer()
+    rapport = importer_fichier(args.fichier, args.taille_lot)
+    print(
+        f"{rapport['lus']} lus, {rapport['inseres']} insérés, {rapport['ignores']} ignorés (déjà présents), "
+        f"{rapport['rejetes']} rejetés en {rapport['duree']} s ({rapport['lignes_par_seconde']} lignes/s)"
+    )
@@ -0,0 +1,138 @@
+"""
+Vérification locale des JWT émis par le service auth.
+
+La clé publique est chargée une seule fois, depuis un fichier PEM
+(JWT_CLE_PUBLIQUE) ou depuis le document JWKS du service auth
+(AUTH_JWKS_URL, relu seulement si un kid inconnu apparaît, après une rotation).
+Les jetons déjà vérifiés sont gardés en cache jusqu'à leur expiration :
+une requête répétée avec le même jeton ne refait pas la vérification de signature.
+
+La vérification n'est active que si AUTH_REQUISE vaut 1. Seules les
+vérifications absentes du cache passent par le pool de threads.
+"""
+import json
+import os
+import threading
+import time
+import urllib.request
+from typing import Optional
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from fastapi import Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from cache import LRUCache, ABSENT
+
+AUTH_REQUISE = os.environ.get("AUTH_REQUISE", "0") == "1"
+JWT_CLE_PUBLIQUE = os.environ.get("JWT_CLE_PUBLIQUE", "")
+AUTH_JWKS_URL = os.environ.get("AUTH_JWKS_URL", "http://127.0.0.1:5000/.well-known/jwks.json")
+# Minimum delay between two JWKS downloads triggered by unknown kids
+JWKS_DELAI_RELECTURE = float(os.environ.get("JWKS_DELAI_RELECTURE", "60"))
+JWT_CACHE_TAILLE = int(os.environ.get("JWT_CACHE_TAILLE", "10000"))
+JWT_CACHE_TTL = float(os.environ.get("JWT_CACHE_TTL", "3600"))
+
+cache_jetons = LRUCache("jetons_verifies", JWT_CACHE_TAILLE, JWT_CACHE_TTL)
+
+_cles = None
+_derniere_lecture = None
+_lock = threading.Lock()
+
+
+def _algorithme(cle):
+    if isinstance(cle, rsa.RSAPublicKey):
+        return "RS256"
+    if isinstance(cle, ec.EllipticCurvePublicKey):
+        return "ES256"
+    if isinstance(cle, ed25519.Ed25519PublicKey):
+        return "EdDSA"
+    raise ValueError(f"Type de clé non supporté : {type(cle).__name__}")
+
+
+def _lire_jwks(url):
+    with urllib.request.urlopen(url, timeout=5) as reponse:
+        jwks = jwt.PyJWKSet.from_dict(json.load(reponse))
+    return {cle.key_id: (cle.key, cle.algorithm_name) for cle in jwks.keys}
+
+
+def charger_cles(forcer=False):
+    """
+    Retourne les clés de vérification : {kid: (clé, algorithme)}.
+    Une clé lue depuis un fichier PEM est rangée sous le kid None (acceptée pour tout kid).
+    """
+    global _cles, _derniere_lecture
+    with _lock:
+        if _cles is None and JWT_CLE_PUBLIQUE:
+            with open(JWT_CLE_PUBLIQUE, "rb") as fichier:
+                cle = serialization.load_pem_public_key(fichier.read())
+            _cles = {None: (cle, _algorithme(cle))}
+        elif _cles is None or (forcer and not JWT_CLE_PUBLIQUE):
+            # Also applies to the first download: while the auth service is down,
+            # requests fail at once instead of queueing behind a 5 s timeout each
+            if _derniere_lecture is not None and time.monotonic() - _derniere_lecture < JWKS_DELAI_RELECTURE:
+                if _cles is None:
+                    raise OSError("Document JWKS indisponible (nouvel essai différé).")
+                return _cles
+            _derniere_lecture = time.monotonic()
+            _cles = _lire_jwks(AUTH_JWKS_URL)
+        return _cles
+
+
+def _cle_pour(token):
+    kid = jwt.get_unverified_header(token).get("kid")
+    cles = charger_cles()
+    if None in cles:
+        return cles[None]
+    if kid not in cles:
+        # Possibly a key added by a rotation since the last download
+        cles = charger_cles(forcer=True)
+    if kid not in cles:
+        raise jwt.InvalidTokenError("Clé inconnue")
+    return cles[kid]
+
+
+def _verifier_signature(token):
+    # Blocking: JWKS download and signature check
+    cle, algorithme = _cle_pour(token)
+    claims = jwt.decode(token, cle, algorithms=[algorithme])
+    if "exp" in claims:
+        cache_jetons.set(token, claims, ttl=claims["exp"] - time.time())
+    return claims
+
+
+def verifier_token(token):
+    """Retourne les claims d'un jeton valide, en évitant de revérifier un jeton déjà vu."""
+    claims = cache_jetons.get(token)
+    if claims is not ABSENT:
+        return claims
+    return _verifier_signature(token)
+
+
+def _refus(detail):
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+async def utilisateur_authentifie(authorization: Optional[str] = Header(None)):
+    """
+    Dépendance FastAPI : vérifie l'en-tête Authorization et retourne les claims,
+    ou None si l'authentification n'est pas exigée.
+    """
+    if not AUTH_REQUISE:
+        return None
+    if not authorization or not authorization.startswith("Bearer "):
+        raise _refus("Jeton manquant.")
+    token = authorization[len("Bearer "):].strip()
+    claims = cache_jetons.get(token)
+    if claims is not ABSENT:
+        return claims
+    try:
+        # Off the event loop: the JWKS download and the signature check block
+        return await run_in_threadpool(_verifier_signature, token)
+    except jwt.ExpiredSignatureError:
+        raise _refus("Jeton expiré.")
+    except jwt.InvalidTokenError:
+        raise _refus("Jeton invalide.")
+    except OSError:
+        # JWKS document unreachable
+        raise HTTPException(status_code=503, detail="Service d'authentification injoignable.")
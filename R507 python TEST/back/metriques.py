@@ -0,0 +1,90 @@
+"""
+Métriques Prometheus du back, exposées en texte sur /metrics.
+
+Durée et nombre de requêtes HTTP par route, requêtes en cours, et pour
+chaque instruction SQL passée par execute_query : durée et lignes lues ou
+modifiées. Les instructions plus lentes que SLOW_QUERY_MS sont journalisées.
+
+Avec plusieurs workers, PROMETHEUS_MULTIPROC_DIR (positionné par serve.py)
+fait écrire les métriques de chaque processus dans des fichiers agrégés
+par /metrics.
+"""
+import logging
+import os
+import re
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, \
+    generate_latest, multiprocess
+from starlette.responses import Response
+
+# 0 disables the slow-query log
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+
+DUREES_SQL = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+requetes_http = Histogram(
+    "back_http_request_duration_seconds", "Durée des requêtes HTTP par route.",
+    ("method", "route", "status"),
+)
+requetes_en_cours = Gauge(
+    "back_http_requests_in_progress", "Requêtes HTTP en cours de traitement.", ("method",),
+    multiprocess_mode="livesum",
+)
+requetes_sql = Histogram(
+    "back_sql_query_duration_seconds", "Durée des instructions SQL.", ("requete",), buckets=DUREES_SQL,
+)
+lignes_sql = Counter(
+    "back_sql_rows_total", "Lignes renvoyées ou modifiées par les instructions SQL.", ("requete",),
+)
+
+journal = logging.getLogger("back.sql")
+
+_ESPACES = re.compile(r"\s+")
+# "IN (?, ?, ?)" lists vary in length: one label for all of them
+_LISTE_PARAMETRES = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+def libelle_sql(requete):
+    """Instruction SQL normalisée, utilisée comme étiquette de métrique."""
+    return _LISTE_PARAMETRES.sub("?, ...", _ESPACES.sub(" ", requete).strip())
+
+
+def observer_sql(requete, duree, lignes):
+    libelle = libelle_sql(requete)
+    requetes_sql.labels(libelle).observe(duree)
+    lignes_sql.labels(libelle).inc(lignes)
+    if SLOW_QUERY_MS and duree * 1000 >= SLOW_QUERY_MS:
+        journal.warning("Requête lente (%.1f ms, %d lignes) : %s", duree * 1000, lignes, libelle)
+
+
+async def mesurer_requete(request, call_next):
+    """Middleware HTTP : durée par route (gabarit de chemin, pas l'URL) et requêtes en cours."""
+    en_cours = requetes_en_cours.labels(request.method)
+    en_cours.inc()
+    debut = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        en_cours.dec()
+        route = request.scope.get("route")
+        requetes_http.labels(
+            request.method, route.path if route is not None else "<inconnue>", str(status)
+        ).observe(time.perf_counter() - debut)
+
+
+async def exposer(request):
+    registre = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registre = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registre)
+    return Response(generate_latest(registre), media_type=CONTENT_TYPE_LATEST)
+
+
+def fin_worker():
+    # Drops the live gauges of this process from the aggregate
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
@@ -1,63 +1,309 @@
-from fastapi import FastAPI, HTTPException, Form
-from fastapi.responses import JSONResponse
-import sqlite3
-
-app = FastAPI()
-
-# Utility function to interact with the SQLite database
-def execute_query(query, params=(), fetchone=False, commit=False):
-    with sqlite3.connect("back/database/database.db") as conn:
-        cur = conn.cursor()
-        cur.execute(query, params)
-        if commit:
-            conn.commit()
-            return cur.lastrowid
-        if fetchone:
-            return cur.fetchone()
-        return cur.fetchall()
-    
+from fastapi import FastAPI, HTTPException, Form, Query, File, UploadFile, Request, Response, Depends
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
+import csv
+import io
+import json
+import re
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+from schema import annee_depuis_date, LIMITE_EMPRUNTS
+from ingestion import importer, lire_enregistrements
+from cache import LRUCache, ABSENT
+from jwt_auth import utilisateur_authentifie, cache_jetons
+import metriques
+from db import run_query, run_in_db, stream_rows, transaction, get_executor, close_pool, migrer, verifier_schema, DatabaseBusy
+
+# orjson serializes responses several times faster than the json module
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as JSONResponse
+except ImportError:
+    from fastapi.responses import JSONResponse
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Once per worker, before the first request: pool and SQLite threads
+    # (migrations are applied beforehand by serve.py or __main__)
+    get_executor()
+    verifier_schema()
+    yield
+    close_pool()
+    metriques.fin_worker()
+
+# Every route checks the Bearer token locally when AUTH_REQUISE=1
+app = FastAPI(lifespan=lifespan, dependencies=[Depends(utilisateur_authentifie)],
+              default_response_class=JSONResponse)
+app.middleware("http")(metriques.mesurer_requete)
+# Plain Starlette route: scraped without a token even when AUTH_REQUISE=1
+app.add_route('/metrics', metriques.exposer)
+
+LIMITE_PAGE_DEFAUT = 50
+LIMITE_PAGE_MAX = 500
+
+# Clients may keep catalogue responses but must revalidate them (ETag)
+CACHE_CONTROL = "no-cache"
+
+COLONNES_UTILISATEURS = ("id", "nom", "email", "livres_empruntes")
+COLONNES_LIVRES = ("id", "titre", "pitch", "date_public", "auteur_id", "emprunteur_id")
+COLONNES_AUTEURS = ("id", "nom")
+EXPRESSIONS_AUTEURS = {"nom": "nom_auteur"}
+STATS_AUTEURS = "stats_auteurs s JOIN Auteurs a ON a.id = s.auteur_id"
+COLONNES_STATS_AUTEURS = ("id", "nom", "nb_livres")
+EXPRESSIONS_STATS_AUTEURS = {"id": "s.auteur_id", "nom": "a.nom_auteur", "nb_livres": "s.nb_livres"}
+
+# Books with author and borrower names, resolved by a single JOIN
+LIVRES_DETAILS = """
+    Livres l
+    LEFT JOIN Auteurs a ON a.id = l.auteur_id
+    LEFT JOIN utilisateurs u ON u.id = l.emprunteur_id
+"""
+COLONNES_LIVRES_DETAILS = COLONNES_LIVRES + ("auteur", "emprunteur")
+EXPRESSIONS_LIVRES_DETAILS = dict(
+    {colonne: f"l.{colonne}" for colonne in COLONNES_LIVRES},
+    auteur="a.nom_auteur", emprunteur="u.nom"
+)
+
+# Hot lookups, invalidated by the write endpoints below
+cache_utilisateurs = LRUCache("utilisateurs")
+cache_utilisateurs_par_nom = LRUCache("utilisateurs_par_nom")
+cache_auteurs_par_nom = LRUCache("auteurs_par_nom")
+cache_emprunts = LRUCache("emprunts")
+
+
+@app.exception_handler(DatabaseBusy)
+async def base_occupee(request, exc):
+    return JSONResponse(status_code=503, content={"detail": "Service surchargé, réessayez plus tard."},
+                        headers={"Retry-After": "1"})
+
+# Endpoint: Hit/miss/eviction counters of the in-process caches
+@app.get('/cache/stats')
+async def get_cache_stats():
+    caches = (cache_utilisateurs, cache_utilisateurs_par_nom, cache_auteurs_par_nom, cache_emprunts, cache_jetons)
+    return JSONResponse(content=[c.stats() for c in caches])
+
 @app.get('/')
 async def index():
     return JSONResponse(content={'message':'Salut bienvenue sur mon api back'})
 
-# Endpoint: Get all users
+def _colonnes_demandees(fields, colonnes):
+    """
+    Projection optionnelle : `fields` est une liste de colonnes séparées par des virgules.
+    L'id est toujours renvoyé car il sert de curseur.
+    """
+    if not fields:
+        return colonnes
+    demandees = [f.strip() for f in fields.split(",") if f.strip()]
+    inconnues = [f for f in demandees if f not in colonnes]
+    if inconnues:
+        raise HTTPException(status_code=400, detail=f"Champ(s) inconnu(s) : {', '.join(inconnues)}.")
+    return ("id",) + tuple(c for c in colonnes if c in demandees and c != "id")
+
+def _select(colonnes, expressions):
+    # `expressions` maps an output column to its SQL expression when they differ
+    return ", ".join(f"{expressions[c]} AS {c}" if c in expressions else c for c in colonnes)
+
+async def _page(table, colonnes, limit, after, fields, expressions=None):
+    """
+    Pagination par curseur (keyset) sur l'id : la page suivante commence après
+    le dernier id renvoyé, sans OFFSET, donc à coût constant quelle que soit la page.
+    """
+    expressions = expressions or {}
+    colonnes = _colonnes_demandees(fields, colonnes)
+    cle = expressions.get("id", "id")
+    lignes = await run_query(
+        f"SELECT {_select(colonnes, expressions)} FROM {table} WHERE {cle} > ? ORDER BY {cle} LIMIT ?",
+        (after, limit + 1)
+    )
+    next_cursor = lignes[limit - 1][0] if len(lignes) > limit else None
+    items = [dict(zip(colonnes, ligne)) for ligne in lignes[:limit]]
+    return {"items": items, "next_cursor": next_cursor}
+
+def _liste_ids(ids):
+    """Analyse "1,2,3" en liste d'ids distincts, dans l'ordre donné."""
+    try:
+        liste = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids doit être une liste d'entiers séparés par des virgules.")
+    if not liste or len(liste) > LIMITE_PAGE_MAX:
+        raise HTTPException(status_code=400, detail=f"Entre 1 et {LIMITE_PAGE_MAX} ids attendus.")
+    return liste
+
+async def _par_ids(table, colonnes, ids, fields, expressions=None):
+    """
+    Lecture groupée d'une liste d'ids en une seule requête (IN), renvoyée
+    dans l'ordre demandé ; les ids inconnus sont absents de la réponse.
+    """
+    expressions = expressions or {}
+    colonnes = _colonnes_demandees(fields, colonnes)
+    ids = _liste_ids(ids)
+    lignes = await run_query(
+        f"SELECT {_select(colonnes, expressions)} FROM {table} "
+        f"WHERE {expressions.get('id', 'id')} IN ({', '.join('?' * len(ids))})",
+        ids
+    )
+    par_id = {ligne[0]: dict(zip(colonnes, ligne)) for ligne in lignes}
+    return {"items": [par_id[i] for i in ids if i in par_id], "next_cursor": None}
+
+async def _etag(*tables):
+    """
+    ETag dérivé des compteurs de version des tables lues (tenus à jour par triggers).
+    Il doit être lu avant les données : une écriture intercalée rend au pire
+    l'ETag obsolète, jamais les données.
+    """
+    versions = dict(await run_query(
+        f"SELECT nom_table, version FROM versions WHERE nom_table IN ({', '.join('?' * len(tables))})",
+        tables
+    ))
+    return '"' + "-".join(f"{table.lower()}-{versions[table]}" for table in tables) + '"'
+
+def _non_modifie(request, etag):
+    entete = request.headers.get("if-none-match")
+    if not entete:
+        return False
+    etags = {valeur.strip().removeprefix("W/") for valeur in entete.split(",")}
+    return "*" in etags or etag in etags
+
+def _entetes_cache(etag):
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+# Endpoint: Get users, one page at a time
 @app.get('/utilisateurs')
-async def get_utilisateurs():
-    utilisateurs = execute_query("SELECT * FROM utilisateurs")
-    response = [
-        {"id": u[0], "nom": u[1], "email": u[2], "livres_empruntes": u[3]} 
-        for u in utilisateurs
-    ]
-    return JSONResponse(content=response)
+async def get_utilisateurs(request: Request, limit: int = Query(LIMITE_PAGE_DEFAUT, ge=1, le=LIMITE_PAGE_MAX),
+                           after: int = Query(0, ge=0), fields: Optional[str] = None):
+    etag = await _etag("utilisateurs")
+    if _non_modifie(request, etag):
+        return Response(status_code=304, headers=_entetes_cache(etag))
+    response = await _page("utilisateurs", COLONNES_UTILISATEURS, limit, after, fields)
+    return JSONResponse(content=response, headers=_entetes_cache(etag))
+
+# Endpoint: Catalogue statistics, read from the trigger-maintained summary tables
+@app.get('/stats')
+async def get_stats(request: Request):
+    etag = await _etag("Livres", "utilisateurs")
+    if _non_modifie(request, etag):
+        return Response(status_code=304, headers=_entetes_cache(etag))
+    globales = await run_query("SELECT cle, valeur FROM stats_globales")
+    siecles = await run_query("SELECT siecle, nb_livres FROM stats_siecles WHERE nb_livres > 0 ORDER BY siecle")
+    response = dict(globales)
+    response["limite_emprunts"] = LIMITE_EMPRUNTS
+    response["siecles"] = [{"siecle": siecle, "nb_livres": nb} for siecle, nb in siecles]
+    return JSONResponse(content=response, headers=_entetes_cache(etag))
 
-# Endpoint: Get all books
+# Endpoint: Number of books per author, one page of authors at a time
+@app.get('/stats/auteurs')
+async def get_stats_auteurs(request: Request, limit: int = Query(LIMITE_PAGE_DEFAUT, ge=1, le=LIMITE_PAGE_MAX),
+                            after: int = Query(0, ge=0)):
+    etag = await _etag("Livres", "Auteurs")
+    if _non_modifie(request, etag):
+        return Response(status_code=304, headers=_entetes_cache(etag))
+    response = await _page(STATS_AUTEURS, COLONNES_STATS_AUTEURS, limit, after, None, EXPRESSIONS_STATS_AUTEURS)
+    return JSONResponse(content=response, headers=_entetes_cache(etag))
+
+# Endpoint: Get books, one page at a time
 @app.get('/livres')
-async def get_livres():
-    livres = execute_query("SELECT * FROM Livres")
-    response = [
-        {
-            "id": l[0],
-            "titre": l[1],
-            "pitch": l[2],
-            "date_public": l[3],
-            "auteur_id": l[4],
-            "emprunteur_id": l[5]
-        } 
-        for l in livres
-    ]
-    return JSONResponse(content=response)
+async def get_livres(request: Request, limit: int = Query(LIMITE_PAGE_DEFAUT, ge=1, le=LIMITE_PAGE_MAX),
+                     after: int = Query(0, ge=0), fields: Optional[str] = None, ids: Optional[str] = None):
+    etag = await _etag("Livres")
+    if _non_modifie(request, etag):
+        return Response(status_code=304, headers=_entetes_cache(etag))
+    if ids is not None:
+        response = await _par_ids("Livres", COLONNES_LIVRES, ids, fields)
+    else:
+        response = await _page("Livres", COLONNES_LIVRES, limit, after, fields)
+    return JSONResponse(content=response, headers=_entetes_cache(etag))
+
+# Endpoint: Get books with author and borrower names, one page at a time (or by ids)
+@app.get('/livres/details')
+async def get_livres_details(request: Request, limit: int = Query(LIMITE_PAGE_DEFAUT, ge=1, le=LIMITE_PAGE_MAX),
+                             after: int = Query(0, ge=0), fields: Optional[str] = None,
+                             ids: Optional[str] = None):
+    etag = await _etag("Livres", "Auteurs", "utilisateurs")
+    if _non_modifie(request, etag):
+        return Response(status_code=304, headers=_entetes_cache(etag))
+    if ids is not None:
+        response = await _par_ids(LIVRES_DETAILS, COLONNES_LIVRES_DETAILS, ids, fields, EXPRESSIONS_LIVRES_DETAILS)
+    else:
+        response = await _page(LIVRES_DETAILS, COLONNES_LIVRES_DETAILS, limit, after, fields,
+                               EXPRESSIONS_LIVRES_DETAILS)
+    return JSONResponse(content=response, headers=_entetes_cache(etag))
+
+# Endpoint: Get authors, one page at a time
+@app.get('/auteurs')
+async def get_auteurs(request: Request, limit: int = Query(LIMITE_PAGE_DEFAUT, ge=1, le=LIMITE_PAGE_MAX),
+                      after: int = Query(0, ge=0)):
+    etag = await _etag("Auteurs")
+    if _non_modifie(request, etag):
+        return Response(status_code=304, headers=_entetes_cache(etag))
+    response = await _page("Auteurs", COLONNES_AUTEURS, limit, after, None, EXPRESSIONS_AUTEURS)
+    return JSONResponse(content=response, headers=_entetes_cache(etag))
+
+def _export(table, colonnes, format):
+    """
+    Export complet d'une table en NDJSON ou CSV, envoyé au fil de la lecture.
+    """
+    lots = stream_rows(f"SELECT {', '.join(colonnes)} FROM {table} ORDER BY id")
+    if format == "csv":
+        def contenu():
+            tampon = io.StringIO()
+            ecrivain = csv.writer(tampon)
+            ecrivain.writerow(colonnes)
+            for lot in lots:
+                ecrivain.writerows(lot)
+                yield tampon.getvalue()
+                tampon.seek(0)
+                tampon.truncate()
+        media_type = "text/csv"
+    else:
+        def contenu():
+            for lot in lots:
+                yield "".join(json.dumps(dict(zip(colonnes, ligne)), ensure_ascii=False) + "\n" for ligne in lot)
+        media_type = "application/x-ndjson"
+    return StreamingResponse(
+        contenu(), media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{table.lower()}.{format}"'}
+    )
+
+# Endpoint: Export all users (NDJSON or CSV)
+@app.get('/utilisateurs/export')
+async def exporter_utilisateurs(format: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    return _export("utilisateurs", COLONNES_UTILISATEURS, format)
+
+# Endpoint: Export all books (NDJSON or CSV)
+@app.get('/livres/export')
+async def exporter_livres(format: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    return _export("Livres", COLONNES_LIVRES, format)
+
+async def _ids_par_nom(nom):
+    ids = cache_utilisateurs_par_nom.get(nom)
+    if ids is ABSENT:
+        jeton = cache_utilisateurs_par_nom.jeton()
+        ids = tuple(u[0] for u in await run_query("SELECT id FROM utilisateurs WHERE nom = ? ORDER BY id", (nom,)))
+        # Unknown names are not cached: another worker may create them
+        if ids:
+            cache_utilisateurs_par_nom.set(nom, ids, jeton)
+    return ids
+
+async def _utilisateur_par_id(utilisateur_id):
+    result = cache_utilisateurs.get(utilisateur_id)
+    if result is ABSENT:
+        jeton = cache_utilisateurs.jeton()
+        result = await run_query("SELECT * FROM utilisateurs WHERE id = ?", (utilisateur_id,), fetchone=True)
+        if result:
+            cache_utilisateurs.set(utilisateur_id, result, jeton)
+    return result
 
 # Endpoint: Get a specific user by ID or name
 @app.get('/utilisateur/{utilisateur}')
 async def get_utilisateur(utilisateur: str):
     if utilisateur.isdigit():
-        result = execute_query("SELECT * FROM utilisateurs WHERE id = ?", (int(utilisateur),), fetchone=True)
+        result = await _utilisateur_par_id(int(utilisateur))
     else:
-        result = execute_query("SELECT * FROM utilisateurs WHERE nom = ?", (utilisateur,))
-        if len(result) > 1:
+        ids = await _ids_par_nom(utilisateur)
+        if len(ids) > 1:
             raise HTTPException(status_code=400, detail="Plusieurs utilisateurs portent ce nom.")
-        elif result:
-            result = result[0]
+        result = await _utilisateur_par_id(ids[0]) if ids else None
     
     if result:
         response = {"id": result[0], "nom": result[1], "email": result[2], "livres_empruntes": result[3]}
@@ -70,18 +316,52 @@ async def get_emprunts(utilisateur: str):
     if utilisateur.isdigit():
         utilisateur_id = int(utilisateur)
     else:
-        user = execute_query("SELECT id FROM utilisateurs WHERE nom = ?", (utilisateur,), fetchone=True)
-        if user:
-            utilisateur_id = user[0]
+        ids = await _ids_par_nom(utilisateur)
+        if ids:
+            utilisateur_id = ids[0]
         else:
             raise HTTPException(status_code=404, detail="Utilisateur non trouvé.")
 
-    livres = execute_query("SELECT titre FROM Livres WHERE emprunteur_id = ?", (utilisateur_id,))
-    response = [{"titre": livre[0]} for livre in livres]
+    response = cache_emprunts.get(utilisateur_id)
+    if response is ABSENT:
+        jeton = cache_emprunts.jeton()
+        livres = await run_query("SELECT titre FROM Livres WHERE emprunteur_id = ?", (utilisateur_id,))
+        response = [{"titre": livre[0]} for livre in livres]
+        cache_emprunts.set(utilisateur_id, response, jeton)
     return JSONResponse(content=response)
 
+def _expression_fts(q):
+    """
+    Transforme la saisie libre en requête FTS5 : chaque mot devient un terme
+    entre guillemets (aucun opérateur FTS n'est interprété) recherché par préfixe.
+    """
+    mots = re.findall(r"\w+", q)
+    return " ".join(f'"{mot}"*' for mot in mots)
+
+# Endpoint: Full-text search over titles, pitches and author names
+@app.get('/livres/recherche')
+async def rechercher_livres(q: str, limit: int = Query(LIMITE_PAGE_DEFAUT, ge=1, le=LIMITE_PAGE_MAX),
+                            offset: int = Query(0, ge=0)):
+    expression = _expression_fts(q)
+    if not expression:
+        raise HTTPException(status_code=400, detail="Recherche vide.")
+
+    livres = await run_query(
+        """
+        SELECT l.id, l.titre, l.pitch, l.date_public, l.auteur_id, l.emprunteur_id, f.auteur
+        FROM livres_fts f JOIN Livres l ON l.id = f.rowid
+        WHERE livres_fts MATCH ?
+        ORDER BY f.rank
+        LIMIT ? OFFSET ?
+        """,
+        (expression, limit + 1, offset)
+    )
+    items = [dict(zip(COLONNES_LIVRES + ("auteur",), livre)) for livre in livres[:limit]]
+    next_offset = offset + limit if len(livres) > limit else None
+    return JSONResponse(content={"items": items, "next_offset": next_offset})
+
 @app.get('/livres/siecle/{numero}')
-async def get_livres_par_siecle(numero: int):
+async def get_livres_par_siecle(request: Request, numero: int):
     """
     Retourne les livres publiés dans un siècle donné.
     Le numéro du siècle est un entier (par exemple, 20 pour le XXe siècle).
@@ -89,16 +369,20 @@ async def get_livres_par_siecle(numero: int):
     if numero < 1 or numero > 21:  # Validation des siècles réalistes
         raise HTTPException(status_code=400, detail="Siècle invalide. Veuillez entrer un siècle entre 1 et 21.")
     
+    etag = await _etag("Livres")
+    if _non_modifie(request, etag):
+        return Response(status_code=304, headers=_entetes_cache(etag))
+
     # Calcul des bornes d'années pour le siècle
     start_year = (numero - 1) * 100 + 1
     end_year = start_year + 99
 
-    # Requête SQLite : extrait l'année en prenant les 4 derniers caractères de la date
-    livres = execute_query(
+    # Requête SQLite : parcours de l'index sur l'année de publication
+    livres = await run_query(
         """
         SELECT id, titre, pitch, date_public, auteur_id, emprunteur_id
         FROM Livres
-        WHERE CAST(SUBSTR(date_public, -4) AS INTEGER) BETWEEN ? AND ?
+        WHERE annee_public BETWEEN ? AND ?
         """,
         (start_year, end_year)
     )
@@ -119,7 +403,7 @@ async def get_livres_par_siecle(numero: int):
     if not response:
         raise HTTPException(status_code=404, detail=f"Aucun livre trouvé pour le {numero}ème siècle.")
     
-    return JSONResponse(content=response)
+    return JSONResponse(content=response, headers=_entetes_cache(etag))
 
 
 # Endpoint: Add a user
@@ -128,11 +412,13 @@ async def ajouter_utilisateur(nom: str = Form(...), email: str = Form(...)):
     if not nom or not email:
         raise HTTPException(status_code=400, detail="Données invalides.")
     
-    utilisateur_id = execute_query(
+    utilisateur_id = await run_query(
         "INSERT INTO utilisateurs (nom, email) VALUES (?, ?)", 
         (nom, email), 
         commit=True
     )
+    # A second user with the same name changes the answer of by-name lookups
+    cache_utilisateurs_par_nom.invalidate(nom)
     response = {"id": utilisateur_id, "message": "Utilisateur ajouté avec succès."}
     return JSONResponse(content=response)
 
@@ -141,77 +427,184 @@ async def ajouter_utilisateur(nom: str = Form(...), email: str = Form(...)):
 async def ajouter_livre(titre: str = Form(...), pitch: str = Form(...), date_public: str = Form(...), auteur_nom: str = Form(...)):
     if not titre or not pitch or not date_public or not auteur_nom:
         raise HTTPException(status_code=400, detail="Données invalides.")
+    try:
+        annee_public = annee_depuis_date(date_public)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Date de publication invalide (format attendu : jj/mm/aaaa ou aaaa-mm-jj).")
 
-    auteur = execute_query("SELECT id FROM Auteurs WHERE nom_auteur = ?", (auteur_nom,), fetchone=True)
-    if not auteur:
-        auteur_id = execute_query("INSERT INTO Auteurs (nom_auteur) VALUES (?)", (auteur_nom,), commit=True)
-    else:
-        auteur_id = auteur[0]
+    auteur_id = cache_auteurs_par_nom.get(auteur_nom)
+    if auteur_id is ABSENT:
+        auteur = await run_query("SELECT id FROM Auteurs WHERE nom_auteur = ?", (auteur_nom,), fetchone=True)
+        if not auteur:
+            auteur_id = await run_query("INSERT INTO Auteurs (nom_auteur) VALUES (?)", (auteur_nom,), commit=True)
+        else:
+            auteur_id = auteur[0]
+        # Authors are never renamed nor deleted: the id can be cached as is
+        cache_auteurs_par_nom.set(auteur_nom, auteur_id)
 
-    livre_id = execute_query(
-        "INSERT INTO Livres (titre, pitch, date_public, auteur_id) VALUES (?, ?, ?, ?)",
-        (titre, pitch, date_public, auteur_id),
+    livre_id = await run_query(
+        "INSERT INTO Livres (titre, pitch, date_public, annee_public, auteur_id) VALUES (?, ?, ?, ?, ?)",
+        (titre, pitch, date_public, annee_public, auteur_id),
         commit=True
     )
 
     response = {"id": livre_id, "message": "Livre ajouté avec succès."}
     return JSONResponse(content=response)
 
+# Endpoint: Bulk import of books (JSON array like data_books.json, or NDJSON)
+@app.post('/livres/importer')
+async def importer_livres(fichier: UploadFile = File(...)):
+    def importer_flux():
+        try:
+            return importer(lire_enregistrements(io.TextIOWrapper(fichier.file, encoding="utf-8")))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Fichier invalide : {e}")
+
+    rapport = await run_in_db(importer_flux)
+    return JSONResponse(content=rapport)
+
+def _supprimer(utilisateur_id):
+    with transaction() as conn:
+        utilisateur = conn.execute("SELECT nom FROM utilisateurs WHERE id = ?", (utilisateur_id,)).fetchone()
+        conn.execute("DELETE FROM utilisateurs WHERE id = ?", (utilisateur_id,))
+    return utilisateur[0] if utilisateur else None
+
 # Endpoint: Delete a user by ID or name
 @app.delete('/utilisateur/{utilisateur}/supprimer')
 async def supprimer_utilisateur(utilisateur: str):
     if utilisateur.isdigit():
         utilisateur_id = int(utilisateur)
     else:
-        utilisateur = execute_query("SELECT id FROM utilisateurs WHERE nom = ?", (utilisateur,), fetchone=True)
+        utilisateur = await run_query("SELECT id FROM utilisateurs WHERE nom = ?", (utilisateur,), fetchone=True)
         if not utilisateur:
             raise HTTPException(status_code=404, detail="Utilisateur non trouvé.")
         utilisateur_id = utilisateur[0]
 
-    execute_query("DELETE FROM utilisateurs WHERE id = ?", (utilisateur_id,), commit=True)
+    nom = await run_in_db(_supprimer, utilisateur_id)
+    cache_utilisateurs.invalidate(utilisateur_id)
+    cache_emprunts.invalidate(utilisateur_id)
+    if nom is not None:
+        cache_utilisateurs_par_nom.invalidate(nom)
     response = {"message": "Utilisateur supprimé avec succès."}
     return JSONResponse(content=response)
 
+def _emprunter_dans(conn, utilisateur_id, livre_id):
+    """
+    Emprunt dans la transaction en cours : l'UPDATE conditionnel empêche
+    deux emprunts simultanés du même livre et le dépassement de la limite.
+    Le compteur `livres_empruntes` est mis à jour par trigger.
+    """
+    cur = conn.execute(
+        """
+        UPDATE Livres SET emprunteur_id = ?
+        WHERE id = ? AND emprunteur_id IS NULL
+          AND (SELECT livres_empruntes FROM utilisateurs WHERE id = ?) < ?
+        """,
+        (utilisateur_id, livre_id, utilisateur_id, LIMITE_EMPRUNTS)
+    )
+    if cur.rowcount == 0:
+        livre = conn.execute("SELECT emprunteur_id FROM Livres WHERE id = ?", (livre_id,)).fetchone()
+        if not livre:
+            raise HTTPException(status_code=404, detail="Livre non trouvé.")
+        if livre[0] is not None:
+            raise HTTPException(status_code=400, detail="Ce livre est déjà emprunté.")
+        if not conn.execute("SELECT 1 FROM utilisateurs WHERE id = ?", (utilisateur_id,)).fetchone():
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé.")
+        raise HTTPException(status_code=400, detail="Limite de livres empruntés atteinte.")
+
+def _rendre_dans(conn, utilisateur_id, livre_id):
+    cur = conn.execute(
+        "UPDATE Livres SET emprunteur_id = NULL WHERE id = ? AND emprunteur_id = ?",
+        (livre_id, utilisateur_id)
+    )
+    if cur.rowcount == 0:
+        if not conn.execute("SELECT 1 FROM Livres WHERE id = ?", (livre_id,)).fetchone():
+            raise HTTPException(status_code=404, detail="Livre non trouvé.")
+        raise HTTPException(status_code=400, detail="Ce livre n'a pas été emprunté par cet utilisateur.")
+
+def _emprunter(utilisateur_id, livre_id):
+    with transaction() as conn:
+        _emprunter_dans(conn, utilisateur_id, livre_id)
+
+def _rendre(utilisateur_id, livre_id):
+    with transaction() as conn:
+        _rendre_dans(conn, utilisateur_id, livre_id)
+
+class OperationEmprunt(BaseModel):
+    utilisateur_id: int
+    livre_id: int
+    action: Literal["emprunter", "rendre"]
+
+class LotEmprunts(BaseModel):
+    operations: List[OperationEmprunt]
+
+def _traiter_lot(operations):
+    """
+    Applique un lot d'emprunts et de retours dans une seule transaction.
+
+    Les retours passent avant les emprunts, pour qu'un usager à la limite
+    puisse rendre puis emprunter dans le même lot. Chaque opération a son
+    SAVEPOINT : un refus n'annule qu'elle, les autres sont validées.
+    Les résultats sont rendus dans l'ordre du lot.
+    """
+    resultats = [None] * len(operations)
+    ordre = sorted(range(len(operations)), key=lambda i: operations[i].action != "rendre")
+    with transaction() as conn:
+        for i in ordre:
+            operation = operations[i]
+            appliquer = _rendre_dans if operation.action == "rendre" else _emprunter_dans
+            conn.execute("SAVEPOINT operation")
+            try:
+                appliquer(conn, operation.utilisateur_id, operation.livre_id)
+            except HTTPException as e:
+                conn.execute("ROLLBACK TO operation")
+                resultats[i] = {"statut": e.status_code, "detail": e.detail}
+            else:
+                resultats[i] = {"statut": 200, "detail": None}
+            conn.execute("RELEASE operation")
+    return [dict(operation.model_dump(), **resultat) for operation, resultat in zip(operations, resultats)]
+
+def _invalider_emprunts(utilisateur_id):
+    # The loan list and the livres_empruntes counter of the user change together
+    cache_utilisateurs.invalidate(utilisateur_id)
+    cache_emprunts.invalidate(utilisateur_id)
+
 # Endpoint: Borrow a book
 @app.put('/utilisateur/{utilisateur_id}/emprunter/{livre_id}')
 async def emprunter_livre(utilisateur_id: int, livre_id: int):
-    livre = execute_query("SELECT emprunteur_id FROM Livres WHERE id = ?", (livre_id,), fetchone=True)
-    if not livre:
-        raise HTTPException(status_code=404, detail="Livre non trouvé.")
-    
-    if livre[0]:
-        raise HTTPException(status_code=400, detail="Ce livre est déjà emprunté.")
-
-    utilisateur = execute_query("SELECT livres_empruntes FROM utilisateurs WHERE id = ?", (utilisateur_id,), fetchone=True)
-    if utilisateur:
-        nombre_livres_empruntes = utilisateur[0]
-        if nombre_livres_empruntes >= 4:
-            raise HTTPException(status_code=400, detail="Limite de livres empruntés atteinte.")
-    execute_query("UPDATE Livres SET emprunteur_id = ? WHERE id = ?", (utilisateur_id, livre_id), commit=True)
-    nouveaux_nombre_livres_empruntes = nombre_livres_empruntes + 1
-    execute_query("UPDATE utilisateurs SET livres_empruntes = ? WHERE id = ?", (nouveaux_nombre_livres_empruntes, utilisateur_id), commit=True)
+    try:
+        await run_in_db(_emprunter, utilisateur_id, livre_id)
+    finally:
+        _invalider_emprunts(utilisateur_id)
     response = {"message": "Livre emprunté avec succès."}
     return JSONResponse(content=response)
 
 # Endpoint: Return a book
 @app.put('/utilisateur/{utilisateur_id}/rendre/{livre_id}')
 async def rendre_livre(utilisateur_id: int, livre_id: int):
-    livre = execute_query("SELECT emprunteur_id FROM Livres WHERE id = ?", (livre_id,), fetchone=True)
-    if not livre:
-        raise HTTPException(status_code=404, detail="Livre non trouvé.")
-    
-    if livre[0] != utilisateur_id:
-        raise HTTPException(status_code=400, detail="Ce livre n'a pas été emprunté par cet utilisateur.")
-    execute_query("UPDATE Livres SET emprunteur_id = NULL WHERE id = ?", (livre_id,), commit=True)
-    utilisateur = execute_query("SELECT livres_empruntes FROM utilisateurs WHERE id = ?", (utilisateur_id,), fetchone=True)
-    if utilisateur:
-        nouveaux_nombre_livres_empruntes = utilisateur[0] - 1
-        execute_query("UPDATE utilisateurs SET livres_empruntes = ? WHERE id = ?", (nouveaux_nombre_livres_empruntes, utilisateur_id), commit=True)
-
+    try:
+        await run_in_db(_rendre, utilisateur_id, livre_id)
+    finally:
+        _invalider_emprunts(utilisateur_id)
     response = {"message": "Livre rendu avec succès."}
     return JSONResponse(content=response)
 
+# Endpoint: Borrow and return many books at once (library desk)
+@app.post('/emprunts/lot')
+async def traiter_lot_emprunts(lot: LotEmprunts):
+    if not lot.operations or len(lot.operations) > LIMITE_PAGE_MAX:
+        raise HTTPException(status_code=400, detail=f"Entre 1 et {LIMITE_PAGE_MAX} opérations attendues.")
+    try:
+        resultats = await run_in_db(_traiter_lot, lot.operations)
+    finally:
+        for utilisateur_id in {operation.utilisateur_id for operation in lot.operations}:
+            _invalider_emprunts(utilisateur_id)
+    reussies = sum(resultat["statut"] == 200 for resultat in resultats)
+    response = {"reussies": reussies, "echouees": len(resultats) - reussies, "resultats": resultats}
+    return JSONResponse(content=response)
+
 if __name__ == "__main__":
     import uvicorn
+    migrer()
     uvicorn.run(app, host="127.0.0.1", port=5010)
     
\ No newline at end of file
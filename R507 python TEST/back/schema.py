@@ -0,0 +1,386 @@
+"""
+Migrations du schéma SQLite.
+
+Chaque migration est une fonction qui reçoit une connexion ; elles sont
+appliquées dans l'ordre et `PRAGMA user_version` retient la dernière appliquée.
+Ne jamais modifier une migration publiée : en ajouter une nouvelle.
+"""
+import re
+
+
+_DATE_ISO = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+# Maximum number of books per user. Also written into the statistics triggers:
+# changing it requires a new migration that recreates them.
+LIMITE_EMPRUNTS = 4
+
+# SQL equivalent of annee_depuis_date(): "jj/mm/aaaa" or ISO "aaaa-mm-jj"
+ANNEE_SQL = """
+    CASE WHEN {date} LIKE '____-__-__%' THEN CAST(SUBSTR({date}, 1, 4) AS INTEGER)
+         ELSE CAST(SUBSTR({date}, -4) AS INTEGER) END
+"""
+
+
+def _colonnes(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _annee_public(conn):
+    # Integer publication year, extracted once instead of on every query
+    if "annee_public" not in _colonnes(conn, "Livres"):
+        conn.execute("ALTER TABLE Livres ADD COLUMN annee_public INTEGER")
+    conn.execute("UPDATE Livres SET annee_public = CAST(SUBSTR(date_public, -4) AS INTEGER)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_livres_annee_public ON Livres(annee_public)")
+    # Safety net for writers that do not fill the column themselves
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS livres_annee_public_insert
+        AFTER INSERT ON Livres WHEN NEW.annee_public IS NULL
+        BEGIN
+            UPDATE Livres SET annee_public = CAST(SUBSTR(NEW.date_public, -4) AS INTEGER) WHERE id = NEW.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS livres_annee_public_update
+        AFTER UPDATE OF date_public ON Livres
+        BEGIN
+            UPDATE Livres SET annee_public = CAST(SUBSTR(NEW.date_public, -4) AS INTEGER) WHERE id = NEW.id;
+        END
+    """)
+
+
+TABLES_VERSIONNEES = ("Livres", "utilisateurs", "Auteurs")
+
+
+def _versions(conn):
+    # Per-table version counters, bumped by triggers on every write, for ETags.
+    # They start from a random value so that ETags from another database never match.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS versions (
+            nom_table TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    for table in TABLES_VERSIONNEES:
+        conn.execute(
+            "INSERT OR IGNORE INTO versions (nom_table, version) VALUES (?, ABS(RANDOM() % 1000000000000))",
+            (table,)
+        )
+        for evenement in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table.lower()}_version_{evenement.lower()}
+                AFTER {evenement} ON {table}
+                BEGIN
+                    UPDATE versions SET version = version + 1 WHERE nom_table = '{table}';
+                END
+            """)
+
+
+def _recherche_plein_texte(conn):
+    # FTS5 index over title, pitch and author name; rowid = Livres.id
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS livres_fts USING fts5(
+            titre, pitch, auteur,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    conn.execute("DELETE FROM livres_fts")
+    indexer_livres(conn)
+    # A row in this table, only ever visible inside a bulk-import transaction,
+    # turns off the per-row insert trigger: the batch is indexed in one statement
+    conn.execute("CREATE TABLE IF NOT EXISTS indexation_differee (actif INTEGER)")
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS livres_fts_insert AFTER INSERT ON Livres
+        WHEN NOT EXISTS (SELECT 1 FROM indexation_differee)
+        BEGIN
+            INSERT INTO livres_fts (rowid, titre, pitch, auteur)
+            VALUES (NEW.id, NEW.titre, NEW.pitch, (SELECT nom_auteur FROM Auteurs WHERE id = NEW.auteur_id));
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS livres_fts_update AFTER UPDATE OF titre, pitch, auteur_id ON Livres
+        BEGIN
+            UPDATE livres_fts
+            SET titre = NEW.titre, pitch = NEW.pitch,
+                auteur = (SELECT nom_auteur FROM Auteurs WHERE id = NEW.auteur_id)
+            WHERE rowid = NEW.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS livres_fts_delete AFTER DELETE ON Livres
+        BEGIN
+            DELETE FROM livres_fts WHERE rowid = OLD.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS auteurs_fts_update AFTER UPDATE OF nom_auteur ON Auteurs
+        BEGIN
+            UPDATE livres_fts SET auteur = NEW.nom_auteur
+            WHERE rowid IN (SELECT id FROM Livres WHERE auteur_id = NEW.id);
+        END
+    """)
+
+
+def _index_jointures(conn):
+    # Foreign keys used by the joined book listing and the per-user loan lookups
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_livres_auteur_id ON Livres(auteur_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_livres_emprunteur_id ON Livres(emprunteur_id)")
+
+
+# Century of a publication year, as used by /livres/siecle/{numero}
+SIECLE_SQL = "(({annee}) - 1) / 100 + 1"
+
+def _ajuster(cle, delta):
+    return f"UPDATE stats_globales SET valeur = valeur + ({delta}) WHERE cle = '{cle}';"
+
+
+def _compter(table, colonne, valeur, delta):
+    # Upsert of a counter row; rows that fall to zero are kept (cheap, and rebuilt away)
+    return f"""
+        INSERT INTO {table} ({colonne}, nb_livres) VALUES ({valeur}, {delta})
+        ON CONFLICT ({colonne}) DO UPDATE SET nb_livres = nb_livres + ({delta});
+    """
+
+
+def _statistiques(conn):
+    """
+    Tables de statistiques tenues à jour par triggers, lues en O(1) par /stats.
+    `utilisateurs.livres_empruntes` est désormais tenu par trigger lui aussi,
+    à partir de `Livres.emprunteur_id` : il ne peut plus dériver.
+    """
+    conn.execute("CREATE TABLE IF NOT EXISTS stats_globales (cle TEXT PRIMARY KEY, valeur INTEGER NOT NULL) WITHOUT ROWID")
+    conn.execute("CREATE TABLE IF NOT EXISTS stats_siecles (siecle INTEGER PRIMARY KEY, nb_livres INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS stats_auteurs (auteur_id INTEGER PRIMARY KEY, nb_livres INTEGER NOT NULL)")
+    siecle_new = SIECLE_SQL.format(annee="NEW.annee_public")
+    siecle_old = SIECLE_SQL.format(annee="OLD.annee_public")
+    a_la_limite = "({alias}.livres_empruntes >= " + str(LIMITE_EMPRUNTS) + ")"
+
+    # Books. Like the full-text index, the insert trigger is turned off during
+    # bulk imports, which count each batch with compter_livres().
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS livres_stats_insert AFTER INSERT ON Livres
+        WHEN NOT EXISTS (SELECT 1 FROM indexation_differee)
+        BEGIN
+            {_ajuster("livres", 1)}
+            {_compter("stats_auteurs", "auteur_id", "NEW.auteur_id", 1)}
+            INSERT INTO stats_siecles (siecle, nb_livres)
+            SELECT {siecle_new}, 1 WHERE NEW.annee_public IS NOT NULL
+            ON CONFLICT (siecle) DO UPDATE SET nb_livres = nb_livres + 1;
+            {_ajuster("livres_empruntes", "NEW.emprunteur_id IS NOT NULL")}
+            UPDATE utilisateurs SET livres_empruntes = livres_empruntes + 1 WHERE id = NEW.emprunteur_id;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS livres_stats_delete AFTER DELETE ON Livres
+        BEGIN
+            {_ajuster("livres", -1)}
+            {_compter("stats_auteurs", "auteur_id", "OLD.auteur_id", -1)}
+            UPDATE stats_siecles SET nb_livres = nb_livres - 1 WHERE siecle = {siecle_old};
+            {_ajuster("livres_empruntes", "-(OLD.emprunteur_id IS NOT NULL)")}
+            UPDATE utilisateurs SET livres_empruntes = livres_empruntes - 1 WHERE id = OLD.emprunteur_id;
+        END
+    """)
+    # Also fired by livres_annee_public_insert, which fills the year after the insert
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS livres_stats_annee AFTER UPDATE OF annee_public ON Livres
+        WHEN OLD.annee_public IS NOT NEW.annee_public
+        BEGIN
+            UPDATE stats_siecles SET nb_livres = nb_livres - 1 WHERE siecle = {siecle_old};
+            INSERT INTO stats_siecles (siecle, nb_livres)
+            SELECT {siecle_new}, 1 WHERE NEW.annee_public IS NOT NULL
+            ON CONFLICT (siecle) DO UPDATE SET nb_livres = nb_livres + 1;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS livres_stats_auteur AFTER UPDATE OF auteur_id ON Livres
+        WHEN OLD.auteur_id IS NOT NEW.auteur_id
+        BEGIN
+            {_compter("stats_auteurs", "auteur_id", "OLD.auteur_id", -1)}
+            {_compter("stats_auteurs", "auteur_id", "NEW.auteur_id", 1)}
+        END
+    """)
+    # Borrow and return: the per-user counter follows Livres.emprunteur_id
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS livres_stats_emprunteur AFTER UPDATE OF emprunteur_id ON Livres
+        WHEN OLD.emprunteur_id IS NOT NEW.emprunteur_id
+        BEGIN
+            {_ajuster("livres_empruntes", "(NEW.emprunteur_id IS NOT NULL) - (OLD.emprunteur_id IS NOT NULL)")}
+            UPDATE utilisateurs SET livres_empruntes = livres_empruntes - 1 WHERE id = OLD.emprunteur_id;
+            UPDATE utilisateurs SET livres_empruntes = livres_empruntes + 1 WHERE id = NEW.emprunteur_id;
+        END
+    """)
+
+    # Users
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS utilisateurs_stats_insert AFTER INSERT ON utilisateurs
+        BEGIN
+            {_ajuster("utilisateurs", 1)}
+            {_ajuster("utilisateurs_a_la_limite", a_la_limite.format(alias="NEW"))}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS utilisateurs_stats_delete AFTER DELETE ON utilisateurs
+        BEGIN
+            {_ajuster("utilisateurs", -1)}
+            {_ajuster("utilisateurs_a_la_limite", "-" + a_la_limite.format(alias="OLD"))}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS utilisateurs_stats_limite AFTER UPDATE OF livres_empruntes ON utilisateurs
+        BEGIN
+            {_ajuster("utilisateurs_a_la_limite",
+                      a_la_limite.format(alias="NEW") + " - " + a_la_limite.format(alias="OLD"))}
+        END
+    """)
+    reconstruire_statistiques(conn)
+
+
+def _annee_public_iso(conn):
+    # ISO dates ("aaaa-mm-jj") were read as year "-jj" by the first version of
+    # _annee_public: recompute the column and recreate its triggers
+    conn.execute(f"UPDATE Livres SET annee_public = {ANNEE_SQL.format(date='date_public')}")
+    conn.execute("DROP TRIGGER IF EXISTS livres_annee_public_insert")
+    conn.execute("DROP TRIGGER IF EXISTS livres_annee_public_update")
+    conn.execute(f"""
+        CREATE TRIGGER livres_annee_public_insert
+        AFTER INSERT ON Livres WHEN NEW.annee_public IS NULL
+        BEGIN
+            UPDATE Livres SET annee_public = {ANNEE_SQL.format(date='NEW.date_public')} WHERE id = NEW.id;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER livres_annee_public_update
+        AFTER UPDATE OF date_public ON Livres
+        BEGIN
+            UPDATE Livres SET annee_public = {ANNEE_SQL.format(date='NEW.date_public')} WHERE id = NEW.id;
+        END
+    """)
+
+
+MIGRATIONS = [
+    _annee_public,
+    _versions,
+    _recherche_plein_texte,
+    _index_jointures,
+    _statistiques,
+    _annee_public_iso,
+]
+
+
+def migrate(conn):
+    """Applique les migrations manquantes dans une seule transaction."""
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= len(MIGRATIONS):
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Re-read under the write lock: another worker may have migrated meanwhile
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for numero in range(version, len(MIGRATIONS)):
+            MIGRATIONS[numero](conn)
+            conn.execute(f"PRAGMA user_version = {numero + 1}")
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def annee_depuis_date(date_public):
+    """
+    Extrait l'année d'une date au format jj/mm/aaaa (ou ISO aaaa-mm-jj,
+    envoyé par les champs de formulaire de type date).
+    Lève ValueError si aucune année n'est reconnue.
+    """
+    date_public = date_public.strip()
+    if _DATE_ISO.fullmatch(date_public):
+        return int(date_public[:4])
+    annee = date_public.rsplit("/", 1)[-1]
+    if not annee.isdigit():
+        raise ValueError(f"Date de publication invalide : {date_public}")
+    return int(annee)
+
+
+def indexer_livres(conn, apres_id=0):
+    """Ajoute à l'index plein texte les livres d'id supérieur à `apres_id`."""
+    conn.execute("""
+        INSERT INTO livres_fts (rowid, titre, pitch, auteur)
+        SELECT l.id, l.titre, l.pitch, a.nom_auteur
+        FROM Livres l LEFT JOIN Auteurs a ON a.id = l.auteur_id
+        WHERE l.id > ?
+    """, (apres_id,))
+
+
+
+def compter_livres(conn, apres_id=0):
+    """
+    Ajoute aux statistiques les livres d'id supérieur à `apres_id`, insérés
+    pendant que les triggers d'insertion étaient désactivés (import en masse).
+    Les livres importés ne sont jamais empruntés.
+    """
+    conn.execute("""
+        UPDATE stats_globales SET valeur = valeur + (SELECT COUNT(*) FROM Livres WHERE id > ?)
+        WHERE cle = 'livres'
+    """, (apres_id,))
+    conn.execute("""
+        INSERT INTO stats_auteurs (auteur_id, nb_livres)
+        SELECT auteur_id, COUNT(*) FROM Livres WHERE id > ? GROUP BY auteur_id
+        ON CONFLICT (auteur_id) DO UPDATE SET nb_livres = nb_livres + excluded.nb_livres
+    """, (apres_id,))
+    conn.execute(f"""
+        INSERT INTO stats_siecles (siecle, nb_livres)
+        SELECT {SIECLE_SQL.format(annee="annee_public")}, COUNT(*) FROM Livres
+        WHERE id > ? AND annee_public IS NOT NULL GROUP BY 1
+        ON CONFLICT (siecle) DO UPDATE SET nb_livres = nb_livres + excluded.nb_livres
+    """, (apres_id,))
+
+
+# Expected content of each statistics table, recomputed from the base tables
+_STATISTIQUES_ATTENDUES = {
+    "stats_globales": f"""
+        SELECT 'livres', COUNT(*) FROM Livres
+        UNION ALL SELECT 'livres_empruntes', COUNT(emprunteur_id) FROM Livres
+        UNION ALL SELECT 'utilisateurs', COUNT(*) FROM utilisateurs
+        UNION ALL SELECT 'utilisateurs_a_la_limite', COUNT(*) FROM (
+            SELECT emprunteur_id FROM Livres WHERE emprunteur_id IN (SELECT id FROM utilisateurs)
+            GROUP BY emprunteur_id HAVING COUNT(*) >= {LIMITE_EMPRUNTS})
+    """,
+    "stats_siecles": f"""
+        SELECT {SIECLE_SQL.format(annee="annee_public")}, COUNT(*) FROM Livres
+        WHERE annee_public IS NOT NULL GROUP BY 1
+    """,
+    "stats_auteurs": "SELECT auteur_id, COUNT(*) FROM Livres WHERE auteur_id IS NOT NULL GROUP BY auteur_id",
+}
+
+
+def ecarts_statistiques(conn):
+    """
+    Compare les statistiques et les compteurs `livres_empruntes` à un recalcul
+    complet. Retourne la liste des écarts (table, clé, valeur tenue, valeur attendue).
+    """
+    ecarts = []
+    for table, requete in _STATISTIQUES_ATTENDUES.items():
+        attendu = {cle: valeur for cle, valeur in conn.execute(requete)}
+        tenu = {cle: valeur for cle, valeur in conn.execute(f"SELECT * FROM {table}") if valeur or cle in attendu}
+        for cle in sorted(attendu.keys() | tenu.keys(), key=str):
+            if attendu.get(cle, 0) != tenu.get(cle, 0):
+                ecarts.append((table, cle, tenu.get(cle), attendu.get(cle, 0)))
+    ecarts.extend(
+        ("utilisateurs.livres_empruntes", id, tenu, attendu)
+        for id, tenu, attendu in conn.execute("""
+            SELECT u.id, u.livres_empruntes, COUNT(l.id) FROM utilisateurs u
+            LEFT JOIN Livres l ON l.emprunteur_id = u.id
+            GROUP BY u.id HAVING u.livres_empruntes IS NOT COUNT(l.id)
+        """)
+    )
+    return ecarts
+
+
+def reconstruire_statistiques(conn):
+    """Recalcule toutes les statistiques et les compteurs `livres_empruntes` depuis les tables de base."""
+    conn.execute("""
+        UPDATE utilisateurs
+        SET livres_empruntes = (SELECT COUNT(*) FROM Livres WHERE emprunteur_id = utilisateurs.id)
+        WHERE livres_empruntes IS NOT (SELECT COUNT(*) FROM Livres WHERE emprunteur_id = utilisateurs.id)
+    """)
+    for table, requete in _STATISTIQUES_ATTENDUES.items():
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"INSERT INTO {table} {requete}")
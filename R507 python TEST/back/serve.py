@@ -0,0 +1,66 @@
+"""
+Point d'entrée de production du back : uvicorn avec plusieurs workers.
+
+Les migrations sont appliquées une seule fois, ici, avant le lancement des
+workers. Chaque worker est ensuite un processus qui importe l'application et
+ouvre son propre pool de connexions au démarrage (voir lifespan dans python.py).
+
+Usage : python serve.py [--workers 4] [--hote 0.0.0.0] [--port 5010]
+Les valeurs par défaut viennent de l'environnement (BACK_WORKERS, BACK_HOTE,
+BACK_PORT, BACK_BACKLOG, BACK_KEEPALIVE, BACK_LOG_LEVEL).
+
+Avec plusieurs workers, les caches en mémoire sont désactivés (CACHE_TAILLE=0)
+sauf si CACHE_TAILLE est fixé explicitement : chaque worker n'invalide que sa
+propre copie, les autres serviraient des données périmées après une écriture.
+"""
+import argparse
+import os
+import tempfile
+
+import uvicorn
+
+WORKERS = int(os.environ.get("BACK_WORKERS", str(os.cpu_count() or 1)))
+HOTE = os.environ.get("BACK_HOTE", "0.0.0.0")
+PORT = int(os.environ.get("BACK_PORT", "5010"))
+BACKLOG = int(os.environ.get("BACK_BACKLOG", "2048"))
+KEEPALIVE = int(os.environ.get("BACK_KEEPALIVE", "5"))
+LOG_LEVEL = os.environ.get("BACK_LOG_LEVEL", "info")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lance le back sous uvicorn.")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--hote", default=HOTE)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--backlog", type=int, default=BACKLOG, help="connexions en attente d'acceptation")
+    parser.add_argument("--keepalive", type=int, default=KEEPALIVE, help="secondes avant de fermer une connexion inactive")
+    parser.add_argument("--log-level", default=LOG_LEVEL)
+    args = parser.parse_args()
+
+    if args.workers > 1 and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        # Workers write their metrics to files so that /metrics aggregates all of them
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="back-metriques-")
+    if args.workers > 1:
+        # Per-process caches: a write only invalidates the copy of the worker that made it
+        os.environ.setdefault("CACHE_TAILLE", "0")
+
+    # Imported after PROMETHEUS_MULTIPROC_DIR is set (db loads the metrics module)
+    from db import migrer
+    # In the parent only: concurrent workers would contend for the write lock
+    migrer()
+
+    uvicorn.run(
+        "python:app",
+        host=args.hote,
+        port=args.port,
+        workers=args.workers,
+        backlog=args.backlog,
+        timeout_keep_alive=args.keepalive,
+        log_level=args.log_level,
+        # One log line per request costs more than most requests themselves
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
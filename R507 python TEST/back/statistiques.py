@@ -0,0 +1,37 @@
+"""
+Vérification et reconstruction des statistiques du catalogue (tables
+stats_*, compteurs utilisateurs.livres_empruntes) tenues par triggers.
+
+Usage : python statistiques.py             # liste les écarts, code de sortie 1 s'il y en a
+        python statistiques.py --reconstruire
+"""
+import argparse
+import sys
+
+from db import get_pool, migrer, transaction
+from schema import ecarts_statistiques, reconstruire_statistiques
+
+
+def verifier():
+    with get_pool().connection() as conn:
+        return ecarts_statistiques(conn)
+
+
+def reconstruire():
+    with transaction() as conn:
+        reconstruire_statistiques(conn)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vérifie ou reconstruit les statistiques du catalogue.")
+    parser.add_argument("--reconstruire", action="store_true",
+                        help="recalcule toutes les statistiques depuis les tables de base")
+    args = parser.parse_args()
+    migrer()
+    if args.reconstruire:
+        reconstruire()
+    ecarts = verifier()
+    for table, cle, tenu, attendu in ecarts:
+        print(f"{table} [{cle}] : {tenu} au lieu de {attendu}")
+    print(f"{len(ecarts)} écart(s)")
+    sys.exit(1 if ecarts else 0)
@@ -0,0 +1,89 @@
+"""
+Débit des requêtes authentifiées sur le back (AUTH_REQUISE=1) avec et sans
+le cache des jetons déjà vérifiés.
+
+Une paire de clés est générée pour l'occasion ; un petit nombre de jetons
+(autant que d'utilisateurs simulés) est réutilisé sur toutes les requêtes,
+comme le ferait un front qui renvoie le jeton de session à chaque appel.
+
+Usage : python bench/bench_auth.py [--requetes 3000] [--algorithme RS256]
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACK_DIR = os.path.join(BENCH_DIR, "..", "back")
+
+CLES = {
+    "RS256": lambda: rsa.generate_private_key(public_exponent=65537, key_size=2048),
+    "ES256": lambda: ec.generate_private_key(ec.SECP256R1()),
+    "EdDSA": ed25519.Ed25519PrivateKey.generate,
+}
+
+
+def mesurer(appel, jetons, n):
+    debut = time.perf_counter()
+    for i in range(n):
+        appel(jetons[i % len(jetons)])
+    return n / (time.perf_counter() - debut)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requetes", type=int, default=3000)
+    parser.add_argument("--jetons", type=int, default=50)
+    parser.add_argument("--algorithme", choices=sorted(CLES), default="RS256")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    privee = CLES[args.algorithme]()
+    chemin_cle = os.path.join(tmp, "public_key.pem")
+    with open(chemin_cle, "wb") as fichier:
+        fichier.write(privee.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo))
+    db_path = os.path.join(tmp, "database.db")
+    shutil.copy(os.path.join(BACK_DIR, "database", "database.db"), db_path)
+    os.environ.update(DATABASE_PATH=db_path, AUTH_REQUISE="1", JWT_CLE_PUBLIQUE=chemin_cle)
+    sys.path.insert(0, BACK_DIR)
+    from fastapi.testclient import TestClient
+    import db
+    import jwt_auth
+    import python
+
+    db.migrer()
+
+    expiration = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)
+    jetons = [jwt.encode({"user_id": i, "exp": expiration}, privee, algorithm=args.algorithme)
+              for i in range(args.jetons)]
+    try:
+        with TestClient(python.app) as client:
+            assert client.get("/").status_code == 401
+            cas = [
+                ("vérification seule", jwt_auth.verifier_token),
+                ("GET / authentifié", lambda jeton: client.get("/", headers={"Authorization": f"Bearer {jeton}"})),
+            ]
+            print(f"{args.algorithme} : {args.jetons} jetons distincts, {args.requetes} requêtes")
+            print(f"{'mesure':<24}{'sans cache (req/s)':>20}{'avec cache (req/s)':>20}")
+            for nom, appel in cas:
+                debits = []
+                for taille in (0, jwt_auth.JWT_CACHE_TAILLE):
+                    jwt_auth.cache_jetons.clear()
+                    jwt_auth.cache_jetons.taille_max = taille
+                    debits.append(mesurer(appel, jetons, args.requetes))
+                print(f"{nom:<24}{debits[0]:>20.0f}{debits[1]:>20.0f}")
+            print(jwt_auth.cache_jetons.stats())
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
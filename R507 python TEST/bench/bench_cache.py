@@ -0,0 +1,95 @@
+"""
+Latence des consultations répétées de profils (par id, par nom, emprunts)
+avec et sans le cache en mémoire du back.
+
+Deux niveaux sont mesurés : la résolution seule (coroutine appelée directement)
+et la requête HTTP complète via le client de test de FastAPI.
+
+Usage : python bench/bench_cache.py [--requetes 5000]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACK_DIR = os.path.join(BENCH_DIR, "..", "back")
+sys.path.insert(0, BENCH_DIR)
+
+from donnees import creer_base
+
+
+def centiles(durees):
+    durees = sorted(durees)
+    return durees[len(durees) // 2], durees[int(len(durees) * 0.99) - 1]
+
+
+async def resolutions(python, ids):
+    # Timed inside the event loop, without the HTTP layer
+    durees = []
+    for i in ids:
+        debut = time.perf_counter()
+        await python._utilisateur_par_id(i)
+        durees.append((time.perf_counter() - debut) * 1000)
+    return durees
+
+
+def activer_caches(python, actif):
+    for cache in (python.cache_utilisateurs, python.cache_utilisateurs_par_nom,
+                  python.cache_auteurs_par_nom, python.cache_emprunts):
+        cache.clear()
+        cache.taille_max = 10000 if actif else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requetes", type=int, default=5000)
+    parser.add_argument("--utilisateurs", type=int, default=1000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_PATH"] = os.path.join(tmp, "catalogue.db")
+    creer_base(os.environ["DATABASE_PATH"], nb_livres=100_000, nb_utilisateurs=args.utilisateurs)
+    sys.path.insert(0, BACK_DIR)
+    from fastapi.testclient import TestClient
+    import db
+    import python
+
+    db.migrer()
+
+    ids = [i % 50 + 1 for i in range(args.requetes)]
+    try:
+        with TestClient(python.app) as client:
+            print(f"{'mesure':<38}{'sans cache p50/p99 (ms)':>26}{'avec cache p50/p99 (ms)':>26}")
+            resultats = []
+            for actif in (False, True):
+                activer_caches(python, actif)
+                resultats.append(centiles(client.portal.call(resolutions, python, ids)))
+            (a50, a99), (b50, b99) = resultats
+            print(f"{'résolution par id':<38}{a50:>15.3f} / {a99:<8.3f}{b50:>15.3f} / {b99:<8.3f}")
+            cas = [
+                ("GET /utilisateur/{id}", lambda i: client.get(f"/utilisateur/{i}")),
+                ("GET /utilisateur/{nom}", lambda i: client.get(f"/utilisateur/Utilisateur {i}")),
+                ("GET /utilisateur/emprunts/{id}", lambda i: client.get(f"/utilisateur/emprunts/{i}")),
+            ]
+            for nom, appel in cas:
+                resultats = []
+                for actif in (False, True):
+                    activer_caches(python, actif)
+                    durees = []
+                    for i in ids:
+                        debut = time.perf_counter()
+                        appel(i)
+                        durees.append((time.perf_counter() - debut) * 1000)
+                    resultats.append(centiles(durees))
+                (a50, a99), (b50, b99) = resultats
+                print(f"{nom:<38}{a50:>15.3f} / {a99:<8.3f}{b50:>15.3f} / {b99:<8.3f}")
+            print(python.cache_utilisateurs.stats())
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Test de charge : débit du back (uvicorn réel) en fonction du nombre de clients
+concurrents, sur des requêtes de lecture et des emprunts/retours.
+
+Usage : python bench/bench_concurrence.py [--duree 5] [--clients 1 2 4 8 16 32]
+La base est copiée dans un répertoire temporaire, l'originale n'est pas modifiée.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACK_DIR = os.path.join(BENCH_DIR, "..", "back")
+sys.path.insert(0, BENCH_DIR)
+
+from lancement import lancer_back
+
+LECTURES = [
+    "/livres",
+    "/utilisateurs",
+    "/utilisateur/1",
+    "/utilisateur/emprunts/1",
+    "/livres/siecle/19",
+]
+
+
+async def client(http, fin, compteur, numero):
+    urls = itertools.cycle(LECTURES)
+    livre_id = numero % 12 + 1
+    while time.perf_counter() < fin:
+        # One client in four also exercises the write path
+        if numero % 4 == 0:
+            await http.put(f"/utilisateur/14/emprunter/{livre_id}")
+            await http.put(f"/utilisateur/14/rendre/{livre_id}")
+            compteur[0] += 2
+        await http.get(next(urls))
+        compteur[0] += 1
+
+
+async def palier(base_url, n, duree):
+    limits = httpx.Limits(max_connections=n, max_keepalive_connections=n)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as http:
+        compteur = [0]
+        debut = time.perf_counter()
+        fin = debut + duree
+        await asyncio.gather(*(client(http, fin, compteur, i) for i in range(n)))
+        return compteur[0] / (time.perf_counter() - debut)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duree", type=float, default=5)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    db_path = os.path.join(tmp, "database.db")
+    shutil.copy(os.path.join(BACK_DIR, "database", "database.db"), db_path)
+    proc, url = lancer_back(db_path)
+    try:
+        print(f"{'clients':>8}{'requêtes/s':>14}")
+        for n in args.clients:
+            debit = asyncio.run(palier(url, n, args.duree))
+            print(f"{n:>8}{debit:>14.1f}")
+    finally:
+        proc.terminate()
+        proc.wait()
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Test de contention sur les emprunts : de nombreux threads empruntent et rendent
+les mêmes livres en parallèle, avec l'ancienne logique (plusieurs connexions et
+COMMIT) puis avec la transaction unique.
+
+Vérifie qu'aucun livre n'est emprunté deux fois, que les compteurs
+`livres_empruntes` restent cohérents, et mesure les COMMIT par requête.
+L'ancienne logique tourne sur une base non migrée (sans les triggers du back).
+Le code de sortie est 1 si la nouvelle logique laisse la moindre incohérence.
+
+Usage : python bench/bench_emprunts.py [--threads 16] [--operations 200]
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACK_DIR = os.path.join(BENCH_DIR, "..", "back")
+sys.path.insert(0, BENCH_DIR)
+
+from donnees import SCHEMA
+
+
+class Refus(Exception):
+    pass
+
+
+def legacy_emprunter(db, utilisateur_id, livre_id):
+    # Mirrors the former emprunter_livre endpoint, one connection per statement
+    livre = db.execute_query("SELECT emprunteur_id FROM Livres WHERE id = ?", (livre_id,), fetchone=True)
+    if livre[0]:
+        raise Refus()
+    utilisateur = db.execute_query("SELECT livres_empruntes FROM utilisateurs WHERE id = ?", (utilisateur_id,), fetchone=True)
+    if utilisateur[0] >= 4:
+        raise Refus()
+    db.execute_query("UPDATE Livres SET emprunteur_id = ? WHERE id = ?", (utilisateur_id, livre_id), commit=True)
+    db.execute_query("UPDATE utilisateurs SET livres_empruntes = ? WHERE id = ?", (utilisateur[0] + 1, utilisateur_id), commit=True)
+
+
+def legacy_rendre(db, utilisateur_id, livre_id):
+    livre = db.execute_query("SELECT emprunteur_id FROM Livres WHERE id = ?", (livre_id,), fetchone=True)
+    if livre[0] != utilisateur_id:
+        raise Refus()
+    db.execute_query("UPDATE Livres SET emprunteur_id = NULL WHERE id = ?", (livre_id,), commit=True)
+    utilisateur = db.execute_query("SELECT livres_empruntes FROM utilisateurs WHERE id = ?", (utilisateur_id,), fetchone=True)
+    db.execute_query("UPDATE utilisateurs SET livres_empruntes = ? WHERE id = ?", (utilisateur[0] - 1, utilisateur_id), commit=True)
+
+
+def preparer_base(path, nb_utilisateurs, nb_livres):
+    conn = sqlite3.connect(path)
+    # Full schema: the back-end migrations also touch Auteurs
+    conn.executescript(SCHEMA)
+    conn.execute("INSERT INTO Auteurs (nom_auteur) VALUES ('Auteur')")
+    conn.executemany("INSERT INTO utilisateurs (nom, email) VALUES (?, ?)",
+                     [(f"u{i}", f"u{i}@example.com") for i in range(nb_utilisateurs)])
+    conn.executemany("INSERT INTO Livres (titre, date_public, auteur_id) VALUES (?, '01/01/1900', 1)",
+                     [(f"livre {i}",) for i in range(nb_livres)])
+    conn.commit()
+    conn.close()
+
+
+def verifier(path):
+    conn = sqlite3.connect(path)
+    derive = conn.execute("""
+        SELECT COUNT(*) FROM utilisateurs u
+        WHERE u.livres_empruntes != (SELECT COUNT(*) FROM Livres l WHERE l.emprunteur_id = u.id)
+    """).fetchone()[0]
+    depassements = conn.execute("""
+        SELECT COUNT(*) FROM (SELECT emprunteur_id FROM Livres WHERE emprunteur_id IS NOT NULL
+                              GROUP BY emprunteur_id HAVING COUNT(*) > 4)
+    """).fetchone()[0]
+    conn.close()
+    return derive, depassements
+
+
+def scenario(nom, emprunter, rendre, db, path, args, migrer):
+    preparer_base(path, args.utilisateurs, args.livres)
+    db.close_pool()
+    if migrer:
+        db.migrer()
+    commits_avant = db.commit_count()
+    compteurs = {"succes": 0, "refus": 0, "doubles": 0}
+    verrou = threading.Lock()
+    barriere = threading.Barrier(args.threads)
+
+    def travail(graine):
+        rng = random.Random(graine)
+        barriere.wait()
+        for _ in range(args.operations):
+            utilisateur_id = rng.randint(1, args.utilisateurs)
+            livre_id = rng.randint(1, args.livres)
+            try:
+                emprunter(utilisateur_id, livre_id)
+            except Exception:
+                with verrou:
+                    compteurs["refus"] += 1
+                continue
+            with verrou:
+                compteurs["succes"] += 1
+            # Another thread may have overwritten our loan in the meantime
+            emprunteur = db.execute_query("SELECT emprunteur_id FROM Livres WHERE id = ?", (livre_id,), fetchone=True)[0]
+            if emprunteur != utilisateur_id:
+                with verrou:
+                    compteurs["doubles"] += 1
+                continue
+            try:
+                rendre(utilisateur_id, livre_id)
+            except Exception:
+                pass
+
+    debut = time.perf_counter()
+    threads = [threading.Thread(target=travail, args=(i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duree = time.perf_counter() - debut
+    db.close_pool()
+
+    derive, depassements = verifier(path)
+    requetes = args.threads * args.operations + compteurs["succes"]
+    commits = db.commit_count() - commits_avant
+    print(f"{nom}: {compteurs['succes']} emprunts, {compteurs['refus']} refus, "
+          f"{compteurs['doubles']} double(s) emprunt(s), {derive} compteur(s) faux, "
+          f"{depassements} dépassement(s) de limite, {commits / requetes:.2f} COMMIT/requête, "
+          f"{requetes / duree:.0f} requêtes/s")
+    return compteurs["doubles"] + derive + depassements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--operations", type=int, default=200)
+    parser.add_argument("--utilisateurs", type=int, default=8)
+    parser.add_argument("--livres", type=int, default=10)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "database.db")
+    os.environ["DATABASE_PATH"] = path
+    sys.path.insert(0, BACK_DIR)
+    import db
+    import python
+
+    try:
+        # Legacy code on the schema it was written for: no counter triggers
+        scenario("avant", lambda u, l: legacy_emprunter(db, u, l), lambda u, l: legacy_rendre(db, u, l),
+                 db, path, args, migrer=False)
+        os.remove(path)
+        incoherences = scenario("après", python._emprunter, python._rendre, db, path, args, migrer=True)
+    finally:
+        shutil.rmtree(tmp)
+    if incoherences:
+        sys.exit(f"{incoherences} incohérence(s) avec la transaction unique.")
+
+
+if __name__ == "__main__":
+    main()
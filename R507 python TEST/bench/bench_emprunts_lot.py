@@ -0,0 +1,97 @@
+"""
+Emprunts et retours traités par seconde : un appel PUT par livre contre
+l'endpoint par lot (POST /emprunts/lot, une transaction par lot).
+
+Chaque usager emprunte puis rend des piles de 4 livres, comme à un guichet.
+Les deux scénarios passent par le client de test de FastAPI et partent
+d'une base identique.
+
+Usage : python bench/bench_emprunts_lot.py [--operations 4000] [--taille-lot 50]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACK_DIR = os.path.join(BENCH_DIR, "..", "back")
+sys.path.insert(0, BENCH_DIR)
+
+from donnees import creer_base
+
+
+def operations(nb, nb_utilisateurs, taille_lot):
+    """
+    Blocs de `taille_lot` emprunts (piles de 4 livres par usager) suivis
+    d'autant de retours des mêmes livres, comme deux passages au guichet.
+    """
+    ops = []
+    livre = 1
+    utilisateur_id = 0
+    while len(ops) < nb:
+        emprunts = []
+        for _ in range(taille_lot // 4):
+            utilisateur_id = utilisateur_id % nb_utilisateurs + 1
+            emprunts += [{"utilisateur_id": utilisateur_id, "livre_id": l, "action": "emprunter"}
+                         for l in range(livre, livre + 4)]
+            livre += 4
+        ops += emprunts + [dict(op, action="rendre") for op in emprunts]
+    return ops[:nb]
+
+
+def unitaires(client, ops):
+    echecs = 0
+    for op in ops:
+        r = client.put(f"/utilisateur/{op['utilisateur_id']}/{op['action']}/{op['livre_id']}")
+        echecs += r.status_code != 200
+    return echecs
+
+
+def par_lots(client, ops, taille_lot):
+    echecs = 0
+    for debut in range(0, len(ops), taille_lot):
+        r = client.post("/emprunts/lot", json={"operations": ops[debut:debut + taille_lot]})
+        echecs += r.json()["echouees"]
+    return echecs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--operations", type=int, default=4000)
+    parser.add_argument("--taille-lot", type=int, default=50)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    modele = os.path.join(tmp, "modele.db")
+    creer_base(modele, nb_livres=args.operations, nb_utilisateurs=200)
+    os.environ["DATABASE_PATH"] = os.path.join(tmp, "database.db")
+    sys.path.insert(0, BACK_DIR)
+    from fastapi.testclient import TestClient
+    import db
+    import python
+
+    db.migrer(modele)
+    # Whole piles only
+    taille_lot = max(4, args.taille_lot // 4 * 4)
+    ops = operations(args.operations, 200, taille_lot)
+    try:
+        for nom, scenario in (("un PUT par livre", lambda c: unitaires(c, ops)),
+                              (f"lots de {taille_lot}", lambda c: par_lots(c, ops, taille_lot))):
+            db.close_pool()
+            shutil.copy(modele, os.environ["DATABASE_PATH"])
+            with TestClient(python.app) as client:
+                commits = db.commit_count()
+                debut = time.perf_counter()
+                echecs = scenario(client)
+                duree = time.perf_counter() - debut
+                commits = db.commit_count() - commits
+            print(f"{nom:<20} {len(ops) / duree:>8.0f} opérations/s  {commits:>6} COMMIT  {echecs} échec(s)")
+    finally:
+        db.close_pool()
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Export du catalogue : réponse JSON construite en mémoire (fetchall + liste de
+dictionnaires, comme l'ancien /livres) contre export NDJSON/CSV en streaming.
+
+Pour chaque mesure un serveur uvicorn neuf est lancé ; on relève le temps
+jusqu'au premier octet, la durée totale et le pic de mémoire (VmHWM) du serveur.
+
+Usage : python bench/bench_export.py [--livres 100000 1000000]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACK_DIR = os.path.join(BENCH_DIR, "..", "back")
+sys.path.insert(0, BENCH_DIR)
+
+from donnees import creer_base
+from lancement import lancer_back
+
+URLS = {
+    "JSON en mémoire": "/bench/livres_complet",
+    "NDJSON streaming": "/livres/export",
+    "CSV streaming": "/livres/export?format=csv",
+}
+
+
+def serveur(port):
+    # Runs in the child process: the real app plus the former full-table endpoint
+    sys.path.insert(0, BACK_DIR)
+    import uvicorn
+    from fastapi.responses import JSONResponse
+    import python
+
+    @python.app.get("/bench/livres_complet")
+    async def livres_complet():
+        livres = await python.run_query("SELECT * FROM Livres")
+        return JSONResponse(content=[
+            {"id": l[0], "titre": l[1], "pitch": l[2], "date_public": l[3], "auteur_id": l[4], "emprunteur_id": l[5]}
+            for l in livres
+        ])
+
+    uvicorn.run(python.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def pic_memoire_mo(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for ligne in f:
+            if ligne.startswith("VmHWM:"):
+                return int(ligne.split()[1]) / 1024
+    return float("nan")
+
+
+def mesurer(db_path, url):
+    # mmap'ed database pages would count in RSS and hide the heap usage
+    proc, base_url = lancer_back(
+        db_path, commande=lambda port: [sys.executable, os.path.abspath(__file__), "--serveur", str(port)],
+        env={"SQLITE_MMAP_SIZE": "0"},
+    )
+    try:
+        # Open the pool before measuring
+        httpx.get(f"{base_url}/livres?limit=1", timeout=600)
+        base = pic_memoire_mo(proc.pid)
+        debut = time.perf_counter()
+        premier_octet = None
+        taille = 0
+        with httpx.stream("GET", base_url + url, timeout=600) as reponse:
+            for morceau in reponse.iter_raw():
+                if premier_octet is None:
+                    premier_octet = time.perf_counter() - debut
+                taille += len(morceau)
+        total = time.perf_counter() - debut
+        return premier_octet * 1000, total, pic_memoire_mo(proc.pid) - base, taille / 1e6
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--livres", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--serveur", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serveur:
+        return serveur(args.serveur)
+
+    tmp = tempfile.mkdtemp()
+    try:
+        for nb in args.livres:
+            path = os.path.join(tmp, f"catalogue_{nb}.db")
+            creer_base(path, nb_livres=nb)
+            print(f"\n{nb} livres")
+            print(f"{'méthode':<20}{'1er octet (ms)':>16}{'total (s)':>11}{'+RSS (Mo)':>11}{'taille (Mo)':>13}")
+            for nom, url in URLS.items():
+                ttfb, total, rss, taille = mesurer(path, url)
+                print(f"{nom:<20}{ttfb:>16.1f}{total:>11.2f}{rss:>11.1f}{taille:>13.1f}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
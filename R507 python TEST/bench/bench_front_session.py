@@ -0,0 +1,78 @@
+"""
+Latence des pages du front avec et sans réutilisation des connexions HTTP
+vers le back (session poolée du client d'API contre une connexion par appel,
+comme le faisait requests.get). Le cache ETag du client est désactivé pour
+ne mesurer que l'effet des connexions.
+
+Usage : python bench/bench_front_session.py [--requetes 300]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACK_DIR = os.path.join(BENCH_DIR, "..", "back")
+FRONT_DIR = os.path.join(BENCH_DIR, "..", "front")
+sys.path.insert(0, BENCH_DIR)
+
+from lancement import lancer_back
+
+PAGES = ["/", "/livres", "/utilisateurs", "/livres/siecle/19"]
+
+
+class ConnexionParAppel:
+    # Stand-in for the session: a new TCP connection for every request
+    def get(self, url, **kwargs):
+        with requests.Session() as session:
+            return session.get(url, **kwargs)
+
+
+def mesurer(client_flask, page, n):
+    durees = []
+    for _ in range(n):
+        debut = time.perf_counter()
+        client_flask.get(page)
+        durees.append((time.perf_counter() - debut) * 1000)
+    durees.sort()
+    return statistics.mean(durees), durees[int(len(durees) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requetes", type=int, default=300)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    db_path = os.path.join(tmp, "database.db")
+    shutil.copy(os.path.join(BACK_DIR, "database", "database.db"), db_path)
+    back, url = lancer_back(db_path)
+    try:
+        os.environ["API_SERVICE_URL"] = url
+        os.environ["API_TAILLE_CACHE"] = "0"
+        sys.path.insert(0, FRONT_DIR)
+        import api_client
+        import front
+
+        client_flask = front.app.test_client()
+        session = api_client.client.session
+        print(f"{'page':<22}{'sans réutilisation moy/p95 (ms)':>34}{'session poolée moy/p95 (ms)':>30}")
+        for page in PAGES:
+            api_client.client.session = ConnexionParAppel()
+            avant = mesurer(client_flask, page, args.requetes)
+            api_client.client.session = session
+            apres = mesurer(client_flask, page, args.requetes)
+            print(f"{page:<22}{avant[0]:>24.2f} / {avant[1]:<7.2f}{apres[0]:>20.2f} / {apres[1]:<7.2f}")
+    finally:
+        back.terminate()
+        back.wait()
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
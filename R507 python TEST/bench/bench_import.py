@@ -0,0 +1,107 @@
+"""
+Import en masse : insertion livre par livre (logique de POST /livres/ajouter,
+une connexion et un COMMIT par requête SQL) contre ingestion.py (lecture en
+flux, table des auteurs en mémoire, executemany par lots transactionnels).
+
+Usage : python bench/bench_import.py [--livres 1000000] [--echantillon 5000]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACK_DIR = os.path.join(BENCH_DIR, "..", "back")
+sys.path.insert(0, BENCH_DIR)
+
+from donnees import MOTS, creer_base
+
+
+def ecrire_catalogue(path, nb, ndjson, graine=0):
+    rng = random.Random(graine)
+    with open(path, "w", encoding="utf-8") as f:
+        if not ndjson:
+            f.write("[\n")
+        for i in range(nb):
+            objet = json.dumps({
+                "id": str(i),
+                "title": f"Import {i} : {' '.join(rng.sample(MOTS, 2))}",
+                "content": " ".join(rng.choices(MOTS, k=15)),
+                "author": f"Auteur importé {rng.randint(1, max(1, nb // 20))}",
+                "date": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1000, 2024)}",
+            }, ensure_ascii=False)
+            if ndjson:
+                f.write(objet + "\n")
+            else:
+                f.write(("    " if i == 0 else ",\n    ") + objet)
+        if not ndjson:
+            f.write("\n]\n")
+
+
+def legacy_ajouter(path, enregistrement):
+    # One connection and commit per statement, as POST /livres/ajouter used to do
+    def execute_query(query, params=(), fetchone=False, commit=False):
+        with sqlite3.connect(path) as conn:
+            cur = conn.execute(query, params)
+            if commit:
+                conn.commit()
+                return cur.lastrowid
+            return cur.fetchone() if fetchone else cur.fetchall()
+
+    auteur = execute_query("SELECT id FROM Auteurs WHERE nom_auteur = ?", (enregistrement["author"],), fetchone=True)
+    auteur_id = auteur[0] if auteur else execute_query(
+        "INSERT INTO Auteurs (nom_auteur) VALUES (?)", (enregistrement["author"],), commit=True)
+    execute_query("INSERT INTO Livres (titre, pitch, date_public, auteur_id) VALUES (?, ?, ?, ?)",
+                  (enregistrement["title"], enregistrement["content"], enregistrement["date"], auteur_id), commit=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--livres", type=int, default=1_000_000)
+    parser.add_argument("--echantillon", type=int, default=5000, help="taille de l'échantillon livre par livre")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        base = os.path.join(tmp, "catalogue.db")
+        os.environ["DATABASE_PATH"] = base
+        sys.path.insert(0, BACK_DIR)
+        import db
+        import ingestion
+
+        # Book by book, on a sample only (the full run would take hours)
+        creer_base(base, nb_livres=0)
+        echantillon = os.path.join(tmp, "echantillon.ndjson")
+        ecrire_catalogue(echantillon, args.echantillon, ndjson=True)
+        with open(echantillon, encoding="utf-8") as f:
+            debut = time.perf_counter()
+            for enregistrement in ingestion.lire_enregistrements(f):
+                legacy_ajouter(base, enregistrement)
+            duree = time.perf_counter() - debut
+        print(f"livre par livre : {args.echantillon} livres en {duree:.1f} s "
+              f"({args.echantillon / duree:.0f} lignes/s, ~{args.livres / (args.echantillon / duree) / 60:.0f} min "
+              f"estimées pour {args.livres})")
+
+        for ndjson in (True, False):
+            nom = "NDJSON" if ndjson else "tableau JSON"
+            fichier = os.path.join(tmp, "catalogue.ndjson" if ndjson else "catalogue.json")
+            ecrire_catalogue(fichier, args.livres, ndjson=ndjson)
+            db.close_pool()
+            os.remove(base)
+            creer_base(base, nb_livres=0)
+            db.migrer()
+            rapport = ingestion.importer_fichier(fichier)
+            print(f"ingestion {nom} : {rapport['inseres']} livres en {rapport['duree']} s "
+                  f"({rapport['lignes_par_seconde']} lignes/s)")
+        db.close_pool()
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
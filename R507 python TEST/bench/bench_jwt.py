@@ -0,0 +1,62 @@
+"""
+Jetons émis et vérifiés par seconde (sur un cœur) pour chaque algorithme
+de signature du service auth : RS256, ES256 et EdDSA.
+
+Pour RS256, la clé passée en PEM (réanalysée par PyJWT à chaque appel,
+comme avant) est comparée à l'objet clé chargé une fois au démarrage.
+Les clés sont générées en mémoire : les fichiers du service ne sont pas lus.
+
+Usage : python bench/bench_jwt.py [--duree 2]
+"""
+import argparse
+import datetime
+import time
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+
+def pem(privee):
+    return (
+        privee.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                             serialization.NoEncryption()),
+        privee.public_key().public_bytes(serialization.Encoding.PEM,
+                                         serialization.PublicFormat.SubjectPublicKeyInfo),
+    )
+
+
+def debit(fonction, duree):
+    n = 0
+    debut = time.perf_counter()
+    fin = debut + duree
+    while time.perf_counter() < fin:
+        for _ in range(20):
+            fonction()
+        n += 20
+    return n / (time.perf_counter() - debut)
+
+
+def mesurer(nom, algorithme, cle_signature, cle_verification, duree):
+    payload = {"user_id": 1, "exp": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)}
+    entetes = {"kid": nom}
+    token = jwt.encode(payload, cle_signature, algorithm=algorithme, headers=entetes)
+    emis = debit(lambda: jwt.encode(payload, cle_signature, algorithm=algorithme, headers=entetes), duree)
+    verifies = debit(lambda: jwt.decode(token, cle_verification, algorithms=[algorithme]), duree)
+    print(f"{nom:<20} {emis:>12.0f} {verifies:>12.0f} {len(token):>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duree", type=float, default=2.0, help="secondes par mesure")
+    args = parser.parse_args()
+
+    rsa_privee = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    ec_privee = ec.generate_private_key(ec.SECP256R1())
+    ed_privee = ed25519.Ed25519PrivateKey.generate()
+
+    print(f"{'algorithme':<20} {'émis/s':>12} {'vérifiés/s':>12} {'taille':>8}")
+    mesurer("RS256 (PEM)", "RS256", *pem(rsa_privee), args.duree)
+    mesurer("RS256 (clé chargée)", "RS256", rsa_privee, rsa_privee.public_key(), args.duree)
+    mesurer("ES256 (clé chargée)", "ES256", ec_privee, ec_privee.public_key(), args.duree)
+    mesurer("EdDSA (clé chargée)", "EdDSA", ed_privee, ed_privee.public_key(), args.duree)
@@ -0,0 +1,81 @@
+"""
+Benchmark de latence des endpoints du back : connexion SQLite par requête
+(ancien comportement) contre pool de connexions persistantes.
+
+Usage : python bench/bench_pool.py [--requetes 500]
+La base est copiée dans un répertoire temporaire, l'originale n'est pas modifiée.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+BACK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "back")
+
+ENDPOINTS = [
+    "/utilisateurs",
+    "/livres",
+    "/utilisateur/1",
+    "/utilisateur/emprunts/1",
+    "/livres/siecle/19",
+]
+
+
+def legacy_execute_query(query, params=(), fetchone=False, commit=False):
+    with sqlite3.connect(os.environ["DATABASE_PATH"]) as conn:
+        cur = conn.cursor()
+        cur.execute(query, params)
+        if commit:
+            conn.commit()
+            return cur.lastrowid
+        if fetchone:
+            return cur.fetchone()
+        return cur.fetchall()
+
+
+def mesurer(client, url, n):
+    durees = []
+    for _ in range(n):
+        debut = time.perf_counter()
+        client.get(url)
+        durees.append((time.perf_counter() - debut) * 1000)
+    durees.sort()
+    return statistics.mean(durees), durees[int(len(durees) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requetes", type=int, default=500)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_PATH"] = os.path.join(tmp, "database.db")
+    shutil.copy(os.path.join(BACK_DIR, "database", "database.db"), os.environ["DATABASE_PATH"])
+    sys.path.insert(0, BACK_DIR)
+
+    from fastapi.testclient import TestClient
+    import db
+    import python
+
+    db.migrer()
+    pooled = db.execute_query
+    try:
+        with TestClient(python.app) as client:
+            print(f"{'endpoint':<28}{'avant moy/p95 (ms)':>22}{'après moy/p95 (ms)':>22}")
+            for url in ENDPOINTS:
+                db.execute_query = legacy_execute_query
+                avant = mesurer(client, url, args.requetes)
+                db.execute_query = pooled
+                apres = mesurer(client, url, args.requetes)
+                print(f"{url:<28}{avant[0]:>12.3f} / {avant[1]:<7.3f}{apres[0]:>12.3f} / {apres[1]:<7.3f}")
+    finally:
+        db.execute_query = pooled
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
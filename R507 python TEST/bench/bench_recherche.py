@@ -0,0 +1,75 @@
+"""
+Latence de la recherche plein texte (/livres/recherche, index FTS5) comparée
+à un LIKE '%terme%' naïf, sur des catalogues de taille croissante.
+
+Usage : python bench/bench_recherche.py [--livres 10000 100000 1000000]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACK_DIR = os.path.join(BENCH_DIR, "..", "back")
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, BACK_DIR)
+
+from donnees import creer_base
+from schema import migrate
+
+FTS = """
+    SELECT l.id, l.titre, l.pitch, l.date_public, l.auteur_id, l.emprunteur_id, f.auteur
+    FROM livres_fts f JOIN Livres l ON l.id = f.rowid
+    WHERE livres_fts MATCH ? ORDER BY f.rank LIMIT 51
+"""
+LIKE = """
+    SELECT l.id, l.titre, l.pitch, l.date_public, l.auteur_id, l.emprunteur_id, a.nom_auteur
+    FROM Livres l LEFT JOIN Auteurs a ON a.id = l.auteur_id
+    WHERE l.titre LIKE ? OR l.pitch LIKE ? OR a.nom_auteur LIKE ? LIMIT 51
+"""
+
+# (label, FTS expression as built by the endpoint, LIKE pattern).
+# Every synthetic book contains "livre": the last query shows that a very
+# frequent term still costs time proportional to the number of matches.
+RECHERCHES = [
+    ("numéro de titre", '"4321"*', "%4321%"),
+    ("préfixe court", '"98"*', "%98%"),
+    ("numéro + titre", '"4321"* "livre"*', "%Livre 4321%"),
+]
+
+
+def chrono(conn, requete, params, repetitions):
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        conn.execute(requete, params).fetchall()
+    return (time.perf_counter() - debut) / repetitions * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--livres", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repetitions", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        print(f"{'livres':>9}  {'recherche':<20}{'FTS5 (ms)':>11}{'LIKE (ms)':>11}")
+        for nb in args.livres:
+            path = os.path.join(tmp, f"catalogue_{nb}.db")
+            creer_base(path, nb_livres=nb)
+            conn = sqlite3.connect(path)
+            migrate(conn)
+            for nom, expression, motif in RECHERCHES:
+                fts = chrono(conn, FTS, (expression,), args.repetitions)
+                like = chrono(conn, LIKE, (motif,) * 3, max(1, args.repetitions // 10))
+                print(f"{nb:>9}  {nom:<20}{fts:>11.2f}{like:>11.2f}")
+            conn.close()
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
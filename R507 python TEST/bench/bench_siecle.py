@@ -0,0 +1,70 @@
+"""
+Requête par siècle : parcours complet avec extraction de l'année dans le texte
+(ancienne requête) contre parcours de l'index sur `annee_public`.
+
+Vérifie le plan d'exécution (EXPLAIN QUERY PLAN) puis mesure les deux requêtes
+sur un catalogue synthétique.
+
+Usage : python bench/bench_siecle.py [--livres 1000000]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "back"))
+
+from donnees import creer_base
+from schema import migrate
+
+AVANT = "SELECT id, titre FROM Livres WHERE CAST(SUBSTR(date_public, -4) AS INTEGER) BETWEEN ? AND ?"
+APRES = "SELECT id, titre FROM Livres WHERE annee_public BETWEEN ? AND ?"
+
+
+def chrono(conn, requete, params, repetitions):
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        lignes = conn.execute(requete, params).fetchall()
+    return (time.perf_counter() - debut) / repetitions * 1000, len(lignes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--livres", type=int, default=1_000_000)
+    parser.add_argument("--repetitions", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "catalogue.db")
+        debut = time.perf_counter()
+        creer_base(path, nb_livres=args.livres)
+        print(f"catalogue de {args.livres} livres généré en {time.perf_counter() - debut:.1f} s")
+
+        conn = sqlite3.connect(path)
+        debut = time.perf_counter()
+        migrate(conn)
+        print(f"migration (colonne + index) en {time.perf_counter() - debut:.1f} s")
+
+        plan = " / ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + APRES, (1901, 2000)))
+        print(f"plan : {plan}")
+        if "idx_livres_annee_public" not in plan:
+            sys.exit("La requête par siècle n'utilise pas l'index idx_livres_annee_public.")
+
+        print(f"{'années':<12}{'lignes':>9}{'avant (ms)':>13}{'après (ms)':>13}")
+        for bornes in [(1901, 2000), (1601, 1700), (1950, 1959), (2020, 2020)]:
+            avant, n = chrono(conn, AVANT, bornes, args.repetitions)
+            apres, m = chrono(conn, APRES, bornes, args.repetitions)
+            assert n == m
+            print(f"{bornes[0]}-{bornes[1]:<7}{n:>9}{avant:>13.1f}{apres:>13.1f}")
+        conn.close()
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
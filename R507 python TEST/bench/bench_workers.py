@@ -0,0 +1,49 @@
+"""
+Requêtes par seconde sur la liste paginée /livres selon le nombre de
+workers uvicorn lancés par back/serve.py.
+
+Chaque mesure est un passage de bench/charge.py en mode uvicorn ; le nombre
+de threads clients croît avec le nombre de workers. Le client tourne sur la
+même machine : sur peu de cœurs il limite lui-même le débit mesuré.
+
+Usage : python bench/bench_workers.py [--workers 1,2,4] [--duree 10]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def mesurer(workers, args):
+    with tempfile.NamedTemporaryFile(suffix=".json") as sortie:
+        subprocess.run(
+            [sys.executable, os.path.join(BENCH_DIR, "charge.py"), "--mode", "uvicorn",
+             "--workers", str(workers), "--threads", str(args.threads_par_worker * workers),
+             "--duree", str(args.duree), "--livres", str(args.livres),
+             "--melange", "liste=1", "--sortie", sortie.name],
+            check=True, stdout=subprocess.DEVNULL,
+        )
+        return json.load(sortie)["operations"]["liste"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", default=",".join(str(2 ** i) for i in range(8) if 2 ** i <= (os.cpu_count() or 1)))
+    parser.add_argument("--threads-par-worker", type=int, default=4)
+    parser.add_argument("--duree", type=float, default=10.0)
+    parser.add_argument("--livres", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cœur(s)")
+    print(f"{'workers':>8}{'req/s':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    for workers in (int(w) for w in args.workers.split(",")):
+        resultat = mesurer(workers, args)
+        print(f"{workers:>8}{resultat['debit']:>10.0f}{resultat['p50_ms']:>10.1f}{resultat['p99_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
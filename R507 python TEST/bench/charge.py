@@ -0,0 +1,234 @@
+"""
+Test de charge reproductible du back sur un catalogue synthétique.
+
+Génère une base jetable (auteurs, livres, usagers, emprunts), lance l'API
+dans le processus (client de test de FastAPI) ou sous uvicorn (back/serve.py),
+puis plusieurs threads tirent des opérations selon un mélange pondéré :
+
+- liste : une page de /livres à partir d'un curseur aléatoire
+- nom : /utilisateur/{nom}
+- siecle : /livres/siecle/{numero}
+- emprunt : emprunt puis retour d'un livre pris parmi quelques livres disputés
+
+Le rapport JSON (débit, p50/p95/p99 par opération, statuts HTTP) peut être
+écrit dans un fichier pour être comparé d'un commit à l'autre.
+
+Usage : python bench/charge.py [--mode uvicorn] [--duree 10] [--threads 8]
+                               [--melange liste=40,nom=20,siecle=10,emprunt=30]
+                               [--sortie rapport.json]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACK_DIR = os.path.join(BENCH_DIR, "..", "back")
+sys.path.insert(0, BENCH_DIR)
+
+from donnees import creer_base
+from lancement import lancer_back
+
+MELANGE_DEFAUT = "liste=40,nom=20,siecle=10,emprunt=30"
+
+
+def lire_melange(texte):
+    melange = {}
+    for element in texte.split(","):
+        nom, _, poids = element.partition("=")
+        if nom not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Opération inconnue : {nom}")
+        melange[nom] = float(poids)
+    return melange
+
+
+def op_liste(client, rng, args):
+    return [client.get("/livres", params={"limit": 50, "after": rng.randint(0, args.livres)})]
+
+
+def op_nom(client, rng, args):
+    return [client.get(f"/utilisateur/Utilisateur {rng.randint(1, args.utilisateurs)}")]
+
+
+def op_siecle(client, rng, args):
+    return [client.get(f"/livres/siecle/{rng.randint(11, 21)}")]
+
+
+def op_emprunt(client, rng, args):
+    # Few books for many users: borrow/return contention on the same rows
+    utilisateur_id = rng.randint(1, args.utilisateurs)
+    livre_id = rng.randint(1, args.livres_disputes)
+    reponses = [client.put(f"/utilisateur/{utilisateur_id}/emprunter/{livre_id}")]
+    if reponses[0].status_code == 200:
+        reponses.append(client.put(f"/utilisateur/{utilisateur_id}/rendre/{livre_id}"))
+    return reponses
+
+
+OPERATIONS = {"liste": op_liste, "nom": op_nom, "siecle": op_siecle, "emprunt": op_emprunt}
+
+
+def centile(durees, p):
+    # Nearest-rank percentile on sorted durations
+    if not durees:
+        return None
+    return durees[min(len(durees) - 1, max(0, round(p / 100 * len(durees)) - 1))]
+
+
+class Mesures:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durees = {nom: [] for nom in OPERATIONS}
+        self.statuts = {nom: {} for nom in OPERATIONS}
+
+    def ajouter(self, nom, duree, statuts):
+        with self._lock:
+            self.durees[nom].append(duree)
+            for statut in statuts:
+                self.statuts[nom][statut] = self.statuts[nom].get(statut, 0) + 1
+
+    def rapport(self, duree_totale):
+        operations = {}
+        for nom, durees in self.durees.items():
+            if not durees:
+                continue
+            durees = sorted(durees)
+            operations[nom] = {
+                "n": len(durees),
+                "debit": round(len(durees) / duree_totale, 1),
+                "p50_ms": round(centile(durees, 50) * 1000, 3),
+                "p95_ms": round(centile(durees, 95) * 1000, 3),
+                "p99_ms": round(centile(durees, 99) * 1000, 3),
+                "max_ms": round(durees[-1] * 1000, 3),
+                "statuts": dict(sorted(self.statuts[nom].items())),
+            }
+        total = sum(o["n"] for o in operations.values())
+        return {"debit_total": round(total / duree_totale, 1), "operations": operations}
+
+
+def travailler(client, graine, args, melange, mesures, debut_mesure, fin):
+    rng = random.Random(graine)
+    noms, poids = list(melange), list(melange.values())
+    while True:
+        maintenant = time.perf_counter()
+        if maintenant >= fin:
+            return
+        nom = rng.choices(noms, poids)[0]
+        try:
+            statuts = [str(r.status_code) for r in OPERATIONS[nom](client, rng, args)]
+        except httpx.HTTPError as e:
+            statuts = [type(e).__name__]
+        if maintenant >= debut_mesure:
+            mesures.ajouter(nom, time.perf_counter() - maintenant, statuts)
+
+
+def lancer_uvicorn(db_path, workers):
+    return lancer_back(db_path, commande=lambda port: [
+        sys.executable, "serve.py", "--hote", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ])
+
+
+def commit_courant():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("processus", "uvicorn"), default="processus")
+    parser.add_argument("--workers", type=int, default=1, help="workers uvicorn")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duree", type=float, default=10.0, help="secondes mesurées")
+    parser.add_argument("--echauffement", type=float, default=1.0, help="secondes non mesurées")
+    parser.add_argument("--melange", type=lire_melange, default=lire_melange(MELANGE_DEFAUT))
+    parser.add_argument("--livres", type=int, default=100_000)
+    parser.add_argument("--auteurs", type=int, default=None)
+    parser.add_argument("--utilisateurs", type=int, default=1000)
+    parser.add_argument("--emprunts", type=int, default=1000, help="livres déjà prêtés au départ")
+    parser.add_argument("--livres-disputes", type=int, default=20)
+    parser.add_argument("--graine", type=int, default=0)
+    parser.add_argument("--sortie", help="fichier où écrire le rapport JSON")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    db_path = os.path.join(tmp, "database.db")
+    creer_base(db_path, nb_livres=args.livres, nb_auteurs=args.auteurs, nb_utilisateurs=args.utilisateurs,
+               graine=args.graine, nb_emprunts=args.emprunts)
+    # The contended books start available
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+            UPDATE utilisateurs SET livres_empruntes = livres_empruntes - (
+                SELECT COUNT(*) FROM Livres WHERE emprunteur_id = utilisateurs.id AND id <= ?)
+        """, (args.livres_disputes,))
+        conn.execute("UPDATE Livres SET emprunteur_id = NULL WHERE id <= ?", (args.livres_disputes,))
+    conn.close()
+
+    serveur = None
+    try:
+        if args.mode == "uvicorn":
+            serveur, url = lancer_uvicorn(db_path, args.workers)
+            clients = [httpx.Client(base_url=url, timeout=30) for _ in range(args.threads)]
+        else:
+            os.environ["DATABASE_PATH"] = db_path
+            sys.path.insert(0, BACK_DIR)
+            from fastapi.testclient import TestClient
+            import db
+            import python
+            db.migrer()
+            # One client (and event loop) per thread, all sharing the app and its pool
+            clients = [TestClient(python.app) for _ in range(args.threads)]
+
+        mesures = Mesures()
+        debut_mesure = time.perf_counter() + args.echauffement
+        fin = debut_mesure + args.duree
+        threads = [
+            threading.Thread(target=travailler,
+                             args=(client, args.graine + i, args, args.melange, mesures, debut_mesure, fin))
+            for i, client in enumerate(clients)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for client in clients:
+            client.close()
+
+        rapport = {
+            "commit": commit_courant(),
+            "configuration": {
+                "mode": args.mode, "workers": args.workers if args.mode == "uvicorn" else None,
+                "threads": args.threads, "duree_s": args.duree, "melange": args.melange,
+                "livres": args.livres, "utilisateurs": args.utilisateurs, "emprunts": args.emprunts,
+                "livres_disputes": args.livres_disputes, "graine": args.graine,
+            },
+            **mesures.rapport(args.duree),
+        }
+    finally:
+        if serveur is not None:
+            serveur.terminate()
+            serveur.wait()
+        elif "db" in sys.modules:
+            sys.modules["db"].close_pool()
+        shutil.rmtree(tmp)
+
+    texte = json.dumps(rapport, indent=2, ensure_ascii=False)
+    if args.sortie:
+        with open(args.sortie, "w", encoding="utf-8") as fichier:
+            fichier.write(texte + "\n")
+    print(texte)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Génération de catalogues synthétiques dans une base SQLite jetable,
+avec le même schéma que back/database/database.db.
+
+Usage : python bench/donnees.py catalogue.db [--livres 100000] [--emprunts 5000]
+"""
+import argparse
+import random
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE utilisateurs (id INTEGER PRIMARY KEY AUTOINCREMENT, nom TEXT, email TEXT, livres_empruntes INTEGER DEFAULT 0);
+CREATE TABLE Auteurs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nom_auteur TEXT UNIQUE
+);
+CREATE TABLE Livres (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    titre TEXT UNIQUE,
+    pitch TEXT,
+    date_public DATE,
+    auteur_id INTEGER, emprunteur_id INTEGER,
+    FOREIGN KEY (auteur_id) REFERENCES Auteurs(id)
+);
+"""
+
+MOTS = ("histoire amour guerre voyage mer nuit ville enfant roi secret jardin "
+        "lettre silence ombre montagne femme homme temps mémoire famille").split()
+
+# Same limit as the back end
+LIMITE_EMPRUNTS = 4
+
+
+def creer_base(path, nb_livres=1000, nb_auteurs=None, nb_utilisateurs=100, graine=0, lot=50_000, nb_emprunts=0):
+    """
+    Crée une base au schéma d'origine remplie de données aléatoires reproductibles.
+    `nb_emprunts` livres sont prêtés sans dépasser la limite par usager, et
+    les compteurs `livres_empruntes` sont tenus cohérents.
+    """
+    rng = random.Random(graine)
+    nb_auteurs = nb_auteurs or max(1, nb_livres // 20)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executescript(SCHEMA)
+    conn.executemany("INSERT INTO Auteurs (nom_auteur) VALUES (?)",
+                     ((f"Auteur {i}",) for i in range(1, nb_auteurs + 1)))
+    conn.executemany("INSERT INTO utilisateurs (nom, email) VALUES (?, ?)",
+                     ((f"Utilisateur {i}", f"utilisateur{i}@example.com") for i in range(1, nb_utilisateurs + 1)))
+    for debut in range(0, nb_livres, lot):
+        conn.executemany(
+            "INSERT INTO Livres (titre, pitch, date_public, auteur_id) VALUES (?, ?, ?, ?)",
+            (
+                (
+                    f"Livre {i} : {' '.join(rng.sample(MOTS, 2))}",
+                    " ".join(rng.choices(MOTS, k=15)),
+                    f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1000, 2024)}",
+                    rng.randint(1, nb_auteurs),
+                )
+                for i in range(debut, min(debut + lot, nb_livres))
+            ),
+        )
+    nb_emprunts = min(nb_emprunts, nb_livres, nb_utilisateurs * LIMITE_EMPRUNTS)
+    if nb_emprunts:
+        livres = rng.sample(range(1, nb_livres + 1), nb_emprunts)
+        places = [u for u in range(1, nb_utilisateurs + 1) for _ in range(LIMITE_EMPRUNTS)]
+        conn.executemany("UPDATE Livres SET emprunteur_id = ? WHERE id = ?",
+                         zip(rng.sample(places, nb_emprunts), livres))
+        conn.execute("""
+            UPDATE utilisateurs
+            SET livres_empruntes = (SELECT COUNT(*) FROM Livres WHERE emprunteur_id = utilisateurs.id)
+        """)
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère un catalogue synthétique dans une base SQLite.")
+    parser.add_argument("base")
+    parser.add_argument("--livres", type=int, default=100_000)
+    parser.add_argument("--auteurs", type=int, default=None)
+    parser.add_argument("--utilisateurs", type=int, default=1000)
+    parser.add_argument("--emprunts", type=int, default=0)
+    parser.add_argument("--graine", type=int, default=0)
+    args = parser.parse_args()
+    creer_base(args.base, nb_livres=args.livres, nb_auteurs=args.auteurs, nb_utilisateurs=args.utilisateurs,
+               graine=args.graine, nb_emprunts=args.emprunts)
@@ -0,0 +1,53 @@
+"""
+Lancement du back dans un processus séparé, commun aux benchmarks : la base
+est migrée une seule fois (comme le fait serve.py), puis le serveur est lancé
+sur un port libre et on attend sa première réponse.
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "back")
+
+
+def port_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def migrer(db_path):
+    # In a child process: the benchmark itself does not import the back
+    subprocess.run([sys.executable, "-c", "from db import migrer; migrer()"],
+                   cwd=BACK_DIR, env=dict(os.environ, DATABASE_PATH=db_path), check=True)
+
+
+def lancer_back(db_path, commande=None, env=None):
+    """
+    Migre la base puis lance le back et attend qu'il réponde.
+    `commande(port)` retourne la ligne de commande (par défaut `uvicorn python:app`),
+    `env` complète l'environnement. Retourne (processus, url).
+    """
+    migrer(db_path)
+    port = port_libre()
+    if commande is None:
+        commande = lambda port: [sys.executable, "-m", "uvicorn", "python:app", "--host", "127.0.0.1",
+                                 "--port", str(port), "--log-level", "warning"]
+    processus = subprocess.Popen(commande(port), cwd=BACK_DIR,
+                                 env=dict(os.environ, **(env or {}), DATABASE_PATH=db_path))
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        if processus.poll() is not None:
+            raise RuntimeError(f"Le back s'est arrêté au démarrage (code {processus.returncode}).")
+        try:
+            httpx.get(url + "/", timeout=0.5)
+            return processus, url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    processus.kill()
+    processus.wait()
+    raise RuntimeError("Le back n'a pas démarré.")
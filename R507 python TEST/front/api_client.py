@@ -0,0 +1,98 @@
+from collections import OrderedDict
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metriques import observer_appel_api
+
+# Configuration du client du back (surchargée par l'environnement)
+API_SERVICE_URL = os.environ.get('API_SERVICE_URL', 'http://127.0.0.1:5010').rstrip('/')
+TAILLE_POOL = int(os.environ.get('API_TAILLE_POOL', '10'))
+DELAI_CONNEXION = float(os.environ.get('API_DELAI_CONNEXION', '2'))
+DELAI_LECTURE = float(os.environ.get('API_DELAI_LECTURE', '10'))
+NB_ESSAIS = int(os.environ.get('API_NB_ESSAIS', '3'))
+BACKOFF = float(os.environ.get('API_BACKOFF', '0.2'))
+TAILLE_CACHE = int(os.environ.get('API_TAILLE_CACHE', '256'))
+
+
+class ClientAPI:
+    """
+    Client HTTP du back partagé par toutes les vues.
+
+    Une seule `requests.Session` garde les connexions ouvertes (keep-alive)
+    dans un pool borné ; chaque appel a un délai maximal, et les GET qui
+    échouent (connexion refusée, 502/503/504) sont retentés avec un délai
+    croissant. Les réponses portant un ETag sont gardées et revalidées par
+    If-None-Match.
+    """
+
+    def __init__(self, base_url=API_SERVICE_URL, taille_pool=TAILLE_POOL,
+                 delai_connexion=DELAI_CONNEXION, delai_lecture=DELAI_LECTURE,
+                 nb_essais=NB_ESSAIS, backoff=BACKOFF, taille_cache=TAILLE_CACHE):
+        self.base_url = base_url
+        self.delais = (delai_connexion, delai_lecture)
+        self.taille_cache = taille_cache
+        essais = Retry(
+            total=nb_essais,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({'GET', 'HEAD'}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adaptateur = HTTPAdapter(pool_connections=1, pool_maxsize=taille_pool, max_retries=essais)
+        self.session = requests.Session()
+        self.session.mount('http://', adaptateur)
+        self.session.mount('https://', adaptateur)
+        self.session.headers.update({'Content-Type': 'application/json'})
+        # Réponses déjà reçues, revalidées par ETag : url -> (etag, données)
+        self._reponses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_json(self, chemin, params=None):
+        """
+        GET JSON sur le back avec requête conditionnelle (If-None-Match) :
+        sur un 304 la réponse gardée en mémoire est réutilisée sans être retéléchargée.
+        """
+        return self.get_json_etag(chemin, params)[0]
+
+    def get_json_etag(self, chemin, params=None):
+        """Comme get_json, mais retourne (données, ETag du back ou None)."""
+        url = requests.Request('GET', f"{self.base_url}{chemin}", params=params).prepare().url
+        headers = {}
+        with self._lock:
+            en_cache = self._reponses.get(url)
+        if en_cache:
+            headers['If-None-Match'] = en_cache[0]
+        debut = time.perf_counter()
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.delais)
+        except requests.exceptions.RequestException:
+            observer_appel_api('GET', 'erreur', time.perf_counter() - debut)
+            raise
+        observer_appel_api('GET', response.status_code, time.perf_counter() - debut)
+        if response.status_code == 304 and en_cache:
+            with self._lock:
+                if url in self._reponses:
+                    self._reponses.move_to_end(url)
+            return en_cache[1], en_cache[0]
+        response.raise_for_status()
+        donnees = response.json()
+        etag = response.headers.get('ETag')
+        if etag and self.taille_cache > 0:
+            with self._lock:
+                self._reponses[url] = (etag, donnees)
+                self._reponses.move_to_end(url)
+                while len(self._reponses) > self.taille_cache:
+                    self._reponses.popitem(last=False)
+        return donnees, etag
+
+    def close(self):
+        self.session.close()
+
+
+client = ClientAPI()
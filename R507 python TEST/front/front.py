@@ -1,17 +1,54 @@
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, Response, jsonify
+from api_client import client
+from page_cache import CachePages
+import metriques
 import requests
 import os
+import time
 
 app = Flask(__name__)
+metriques.instrumenter(app)
+
+# Nombre de lignes affichées par page
+TAILLE_PAGE = int(os.environ.get('TAILLE_PAGE', '50'))
+# Statistiques du cache des pages écrites dans le journal toutes les N consultations
+INTERVALLE_LOG_CACHE = int(os.environ.get('PAGE_CACHE_INTERVALLE_LOG', '1000'))
+
+cache_pages = CachePages()
+
+def _reponse_html(page):
+    if page.html_gzip is not None and 'gzip' in request.accept_encodings:
+        return Response(page.html_gzip, mimetype='text/html',
+                        headers={'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'})
+    return Response(page.html, mimetype='text/html', headers={'Vary': 'Accept-Encoding'})
+
+def page_en_cache(chemin, params, rendre):
+    """
+    Appelle le back puis rend la page avec `rendre(donnees)`, sauf si une page
+    rendue à partir des mêmes données (même ETag du back) est déjà en cache.
+    """
+    donnees, etag = client.get_json_etag(chemin, params)
+    if not etag:
+        return rendre(donnees)
+    cle = request.full_path
+    page = cache_pages.get(cle, etag)
+    if page is None:
+        debut = time.perf_counter()
+        html = rendre(donnees)
+        page = cache_pages.set(cle, etag, html, time.perf_counter() - debut)
+    stats = cache_pages.stats()
+    if INTERVALLE_LOG_CACHE > 0 and (stats['hits'] + stats['misses']) % INTERVALLE_LOG_CACHE == 0:
+        app.logger.info(f"Cache des pages : {stats}")
+    return _reponse_html(page)
+
+@app.route('/cache/stats')
+def stats_cache():
+    return jsonify(cache_pages.stats())
 
-# URL du service API
-api_service_url = 'http://api_back:5000'
 @app.route('/')
 def accueil():
     try:
-        response = requests.get(api_service_url)
-        response.raise_for_status()
-        message = response.json().get('message', 'Bienvenue sur l’interface utilisateur.')
+        message = client.get_json('/').get('message', 'Bienvenue sur l’interface utilisateur.')
         return render_template('index.jinja2', message=message)
     except requests.exceptions.RequestException as e:
         app.logger.error(f"Erreur lors de la connexion à l'API: {e}")
@@ -20,12 +57,11 @@ def accueil():
 @app.route('/utilisateurs')
 def utilisateurs():
     try:
-        headers = {'Content-Type': 'application/json'}
-        response = requests.get(f"{api_service_url}/utilisateurs", headers=headers)
-        response.raise_for_status()
-        utilisateurs = response.json()
+        params = {'limit': TAILLE_PAGE, 'after': request.args.get('after', 0, type=int)}
         nom_colonne = ["ID", "Nom", "Email", "Nombre de livres empruntés"]
-        return render_template('utilisateurs.jinja2', utilisateurs=utilisateurs, col=nom_colonne)
+        return page_en_cache("/utilisateurs", params, lambda page: render_template(
+            'utilisateurs.jinja2', utilisateurs=page['items'], col=nom_colonne,
+            next_cursor=page['next_cursor'], after=params['after']))
     except requests.exceptions.RequestException as e:
         app.logger.error(f"Erreur lors de la connexion à l'API: {e}")
         return render_template('utilisateurs.jinja2', error=str(e))
@@ -33,12 +69,11 @@ def utilisateurs():
 @app.route('/livres')
 def livres():
     try:
-        headers = {'Content-Type': 'application/json'}
-        response = requests.get(f"{api_service_url}/livres", headers=headers)
-        response.raise_for_status()
-        lst_livres = response.json()
+        params = {'limit': TAILLE_PAGE, 'after': request.args.get('after', 0, type=int)}
         nom_colonne = ["ID", "Titre", "Résumé", "Date de publication", "Auteur", "Disponibilité"]
-        return render_template('livres.jinja2', lst=lst_livres, col=nom_colonne)
+        return page_en_cache("/livres/details", params, lambda page: render_template(
+            'livres.jinja2', livres=page['items'], col=nom_colonne,
+            next_cursor=page['next_cursor'], after=params['after']))
     except requests.exceptions.RequestException as e:
         app.logger.error(f"Erreur lors de la connexion à l'API: {e}")
         return render_template('livres.jinja2', error=str(e))
@@ -46,12 +81,11 @@ def livres():
 @app.route('/auteurs')
 def auteurs():
     try:
-        headers = {'Content-Type': 'application/json'}
-        response = requests.get(f"{api_service_url}/auteurs", headers=headers)
-        response.raise_for_status()
-        auteurs = response.json()
+        params = {'limit': TAILLE_PAGE, 'after': request.args.get('after', 0, type=int)}
         nom_colonne = ["ID", "Nom"]
-        return render_template('auteurs.jinja2', auteurs=auteurs, col=nom_colonne)
+        return page_en_cache("/auteurs", params, lambda page: render_template(
+            'auteurs.jinja2', auteurs=page['items'], col=nom_colonne,
+            next_cursor=page['next_cursor'], after=params['after']))
     except requests.exceptions.RequestException as e:
         app.logger.error(f"Erreur lors de la connexion à l'API: {e}")
         return render_template('auteurs.jinja2', error=str(e))
@@ -59,10 +93,7 @@ def auteurs():
 @app.route('/utilisateur/<utilisateur>')
 def utilisateur(utilisateur):
     try:
-        headers = {'Content-Type': 'application/json'}
-        response = requests.get(f"{api_service_url}/utilisateur/{utilisateur}", headers=headers)
-        response.raise_for_status()
-        utilisateur_info = response.json()
+        utilisateur_info = client.get_json(f"/utilisateur/{utilisateur}")
         return render_template('utilisateur.jinja2', utilisateur=utilisateur_info)
     except requests.exceptions.RequestException as e:
         app.logger.error(f"Erreur lors de la connexion à l'API: {e}")
@@ -71,12 +102,9 @@ def utilisateur(utilisateur):
 @app.route('/livres/siecle/<int:numero>')
 def livres_par_siecle(numero):
     try:
-        headers = {'Content-Type': 'application/json'}
-        response = requests.get(f"{api_service_url}/livres/siecle/{numero}", headers=headers)
-        response.raise_for_status()
-        lst_livres = response.json()
         nom_colonne = ["ID", "Titre", "Résumé", "Date de publication", "Auteur", "Disponibilité"]
-        return render_template('livres_siecle.jinja2', lst=lst_livres, col=nom_colonne, siecle=numero)
+        return page_en_cache(f"/livres/siecle/{numero}", None, lambda lst_livres: render_template(
+            'livres_siecle.jinja2', livres=lst_livres, col=nom_colonne, siecle=numero))
     except requests.exceptions.RequestException as e:
         app.logger.error(f"Erreur lors de la connexion à l'API: {e}")
         return render_template('livres_siecle.jinja2', error=str(e), siecle=numero)
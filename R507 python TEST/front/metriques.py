@@ -0,0 +1,54 @@
+import time
+
+from flask import Response, g, has_request_context, request
+from prometheus_client import CONTENT_TYPE_LATEST, Gauge, Histogram, generate_latest
+
+# Métriques Prometheus du front, exposées en texte sur /metrics
+requetes_http = Histogram(
+    'front_http_request_duration_seconds', 'Durée des requêtes HTTP par route.',
+    ('method', 'route', 'status'),
+)
+requetes_en_cours = Gauge(
+    'front_http_requests_in_progress', 'Requêtes HTTP en cours de traitement.', ('method',),
+)
+appels_api = Histogram(
+    'front_api_request_duration_seconds', 'Durée des appels au back, par vue appelante.',
+    ('vue', 'method', 'status'),
+)
+
+
+def observer_appel_api(method, status, duree):
+    # Labelled by the calling view rather than the URL, which contains ids and names
+    vue = request.endpoint if has_request_context() and request.endpoint else '<hors_requete>'
+    appels_api.labels(vue, method, str(status)).observe(duree)
+
+
+def _debut():
+    g.debut_requete = time.perf_counter()
+    requetes_en_cours.labels(request.method).inc()
+
+
+def _statut(response):
+    g.statut_requete = response.status_code
+    return response
+
+
+def _fin(exception):
+    if 'debut_requete' not in g:
+        return
+    requetes_en_cours.labels(request.method).dec()
+    route = request.url_rule.rule if request.url_rule is not None else '<inconnue>'
+    statut = g.get('statut_requete', 500)
+    requetes_http.labels(request.method, route, str(statut)).observe(time.perf_counter() - g.debut_requete)
+
+
+def exposer():
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+
+
+def instrumenter(app):
+    """Mesure toutes les vues de `app` et ajoute la route /metrics."""
+    app.before_request(_debut)
+    app.after_request(_statut)
+    app.teardown_request(_fin)
+    app.add_url_rule('/metrics', 'metrics', exposer)
@@ -0,0 +1,97 @@
+from collections import OrderedDict
+import gzip
+import os
+import threading
+
+# Configuration du cache des pages rendues (surchargée par l'environnement)
+TAILLE_MAX_OCTETS = int(os.environ.get('PAGE_CACHE_OCTETS', str(32 * 1024 * 1024)))
+GZIP_ACTIF = os.environ.get('PAGE_CACHE_GZIP', '1') == '1'
+NIVEAU_GZIP = int(os.environ.get('PAGE_CACHE_NIVEAU_GZIP', '6'))
+
+
+class PageRendue:
+    """HTML d'une page, sa version compressée et l'ETag du back dont elle est issue."""
+
+    __slots__ = ('etag', 'html', 'html_gzip', 'duree_rendu')
+
+    def __init__(self, etag, html, html_gzip, duree_rendu):
+        self.etag = etag
+        self.html = html
+        self.html_gzip = html_gzip
+        self.duree_rendu = duree_rendu
+
+    @property
+    def taille(self):
+        return len(self.html) + len(self.html_gzip or b'')
+
+
+class CachePages:
+    """
+    Cache LRU des pages HTML rendues, borné en octets.
+
+    Une page est servie depuis le cache tant que le back renvoie le même ETag
+    pour les données qui ont servi à la rendre ; un nouvel ETag (donnée
+    modifiée) la remplace au rendu suivant. Le corps peut être compressé en
+    gzip une seule fois, au moment de la mise en cache.
+    """
+
+    def __init__(self, taille_max_octets=TAILLE_MAX_OCTETS, gzip_actif=GZIP_ACTIF, niveau_gzip=NIVEAU_GZIP):
+        self.taille_max_octets = taille_max_octets
+        self.gzip_actif = gzip_actif
+        self.niveau_gzip = niveau_gzip
+        self._pages = OrderedDict()
+        self._octets = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Cumulated render time of the pages served from the cache
+        self.duree_economisee = 0.0
+
+    def get(self, cle, etag):
+        with self._lock:
+            page = self._pages.get(cle)
+            if page is not None and page.etag == etag:
+                self._pages.move_to_end(cle)
+                self.hits += 1
+                self.duree_economisee += page.duree_rendu
+                return page
+            self.misses += 1
+            return None
+
+    def set(self, cle, etag, html, duree_rendu):
+        html = html.encode('utf-8')
+        html_gzip = gzip.compress(html, self.niveau_gzip) if self.gzip_actif else None
+        page = PageRendue(etag, html, html_gzip, duree_rendu)
+        if page.taille > self.taille_max_octets:
+            return page
+        with self._lock:
+            ancienne = self._pages.pop(cle, None)
+            if ancienne is not None:
+                self._octets -= ancienne.taille
+            self._pages[cle] = page
+            self._octets += page.taille
+            while self._octets > self.taille_max_octets:
+                _, evincee = self._pages.popitem(last=False)
+                self._octets -= evincee.taille
+                self.evictions += 1
+        return page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._octets = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'pages': len(self._pages),
+                'octets': self._octets,
+                'taille_max_octets': self.taille_max_octets,
+                'hits': self.hits,
+                'misses': self.misses,
+                'ratio_hits': round(self.hits / total, 3) if total else None,
+                'evictions': self.evictions,
+                'duree_rendu_economisee_s': round(self.duree_economisee, 3),
+            }